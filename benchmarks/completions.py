@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pio.aio import AIOSystem
+from pio.bus import CQE
+
+
+def _(value: object) -> None: ...
+
+
+def run(workers: int, total: int, batch: int) -> float:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, 1_024)
+    per_worker = total // workers
+    cqe = (CQE(None, _), "bench")
+
+    def produce() -> None:
+        for _ in range(per_worker // batch):
+            aio.enqueue_many([cqe] * batch)
+        for _ in range(per_worker % batch):
+            aio.enqueue(cqe)
+
+    threads = [threading.Thread(target=produce) for _ in range(workers)]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+
+    received = 0
+    while received < per_worker * workers:
+        received += len(aio.dequeue(1_024))
+
+    elapsed = time.perf_counter() - start
+    for t in threads:
+        t.join()
+    aio.shutdown()
+    return received / elapsed
+
+
+def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    for batch in [1, 64]:
+        for workers in [1, 4, 16]:
+            rate = run(workers, total, batch)
+            sys.stdout.write(f"workers={workers:<3} batch={batch:<3} completions/sec={rate:,.0f}\n")
+
+
+if __name__ == "__main__":
+    main()
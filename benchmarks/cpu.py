@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import functools
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from pio import Pio
+from pio.aio import AIOSystem
+from pio.subsystems.function import FunctionSubsystem
+from pio.subsystems.process_function import (
+    ProcessFunctionSubmission,
+    ProcessFunctionSubsystem,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pio.scheduler import Computation
+
+
+def burn(n: int) -> int:
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def threads(n: int) -> Computation[Callable[[], int], int]:
+    p = yield functools.partial(burn, n)
+    v = yield p
+    return v
+
+
+def processes(n: int) -> Computation[ProcessFunctionSubmission, int]:
+    p = yield ProcessFunctionSubmission(functools.partial(burn, n))
+    v = yield p
+    return v
+
+
+def run(name: str, workers: int, tasks: int, n: int) -> float:
+    pool = ThreadPoolExecutor(workers + 1)
+    aio = AIOSystem(pool, tasks)
+    comp: Callable[[int], Computation[Any, int]]
+    if name == "threads":
+        aio.attach_subsystem(FunctionSubsystem(aio, pool, tasks, workers))
+        comp = threads
+    else:
+        aio.attach_subsystem(
+            ProcessFunctionSubsystem(
+                aio,
+                pool,
+                tasks,
+                processes=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        )
+        comp = processes
+
+    system = Pio(aio, tasks, tasks, wakeup=True)
+    system.start()
+    # warm up the process pool so spawn cost isn't measured
+    for f in [system.add(comp(1)) for _ in range(workers)]:
+        f.result()
+
+    start = time.perf_counter()
+    for f in [system.add(comp(n)) for _ in range(tasks)]:
+        f.result()
+    elapsed = time.perf_counter() - start
+
+    system.shutdown()
+    return tasks / elapsed
+
+
+def main() -> None:
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    n = 1_000_000
+    cores = os.process_cpu_count() or 1
+    for name in ["threads", "processes"]:
+        for workers in sorted({1, 2, 4, cores}):
+            rate = run(name, workers, tasks, n)
+            sys.stdout.write(f"{name:<10} workers={workers:<3} tasks/sec={rate:.2f}\n")
+
+
+if __name__ == "__main__":
+    main()
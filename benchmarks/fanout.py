@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import random
+import sys
+import time
+from typing import TYPE_CHECKING, Any
+
+from pio.aio import AIODst
+from pio.scheduler import All, Computation, Promise, Scheduler
+from pio.subsystems.echo import EchoSubmission, EchoSubsystem
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def sequential(n: int) -> Computation[EchoSubmission, list[Any]]:
+    promises: list[Promise] = []
+    for i in range(n):
+        p = yield EchoSubmission(str(i))
+        promises.append(p)
+
+    results: list[Any] = []
+    for p in promises:
+        v = yield p
+        results.append(v)
+    return results
+
+
+def gather(n: int) -> Computation[EchoSubmission, list[Any]]:
+    v = yield All([EchoSubmission(str(i)) for i in range(n)])
+    return v
+
+
+def run(comp: Callable[[int], Computation[EchoSubmission, list[Any]]], n: int) -> float:
+    aio = AIODst(random.Random(0), 0)
+    aio.attach_subsystem(EchoSubsystem(aio, size=n))
+    scheduler = Scheduler(aio)
+
+    start = time.perf_counter()
+    f = scheduler.add(comp(n))
+    while not f.done():
+        for cqe in aio.dequeue(n):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(0)
+        aio.flush(0)
+    elapsed = time.perf_counter() - start
+
+    assert len(f.result()) == n
+    return elapsed
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    for name, comp in [("sequential", sequential), ("all", gather)]:
+        elapsed = min(run(comp, n) for _ in range(5))
+        sys.stdout.write(f"{name:<10} fanout={n} time={elapsed * 1_000:.3f}ms\n")
+
+
+if __name__ == "__main__":
+    main()
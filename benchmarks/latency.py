@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from pio import Pio
+from pio.aio import AIOSystem
+from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+
+if TYPE_CHECKING:
+    from pio.scheduler import Computation
+
+
+def foo(string: str) -> Computation[EchoSubmission, EchoCompletion]:
+    p = yield EchoSubmission(string)
+    v = yield p
+    assert isinstance(v, EchoCompletion)
+    return v
+
+
+def run(*, wakeup: bool, n: int) -> list[float]:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    system = Pio(aio, wakeup=wakeup)
+    system.start()
+
+    samples: list[float] = []
+    for i in range(n):
+        start = time.perf_counter()
+        system.add(foo(str(i))).result()
+        samples.append(time.perf_counter() - start)
+
+    system.shutdown()
+    return samples
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for name, wakeup in [("polling", False), ("wakeup", True)]:
+        samples = sorted(run(wakeup=wakeup, n=n))
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        sys.stdout.write(
+            f"{name:<8} n={n} "
+            f"p50={statistics.median(samples) * 1_000:.3f}ms "
+            f"p99={p99 * 1_000:.3f}ms\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from pio.aio import AIOSystem
+from pio.scheduler import Scheduler
+from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pio.scheduler import Computation
+
+
+def foo(string: str) -> Computation[EchoSubmission, EchoCompletion]:
+    p = yield EchoSubmission(string)
+    v = yield p
+    return v
+
+
+def bar(string: str) -> Computation[EchoSubmission, EchoCompletion]:
+    p = yield foo(string)
+    v = yield p
+    return v
+
+
+def run(comp: Callable[[str], Computation[EchoSubmission, EchoCompletion]], n: int) -> float:
+    # the subsystem is never started, every submission stays parked in its queue
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, n)
+    aio.attach_subsystem(EchoSubsystem(aio, pool, n))
+    scheduler = Scheduler(aio, n)
+    data = "x"
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(n):
+        scheduler.add(comp(data))
+    scheduler.run_until_blocked(0)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert aio.metrics.snapshot()['pio_aio_submitted_total{kind="echo"}'] == n
+    return (after - before) / n
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for name, comp in [("flat", foo), ("nested", bar)]:
+        sys.stdout.write(f"{name:<7} n={n} bytes/computation={run(comp, n):,.0f}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import gc
+import random
+import sys
+import time
+from typing import Any
+
+from pio.aio import AIODst
+from pio.scheduler import Computation, Scheduler
+from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+
+
+def nested(depth: int, *, io: bool) -> Computation[Any, Any]:
+    if depth == 0:
+        if not io:
+            return "leaf"
+        p = yield EchoSubmission("leaf")
+    else:
+        p = yield nested(depth - 1, io=io)
+    v = yield p
+    return v
+
+
+def run(depth: int, n: int, *, io: bool, inline: int) -> float:
+    aio = AIODst(random.Random(0), 0)
+    aio.attach_subsystem(EchoSubsystem(aio, size=n))
+    scheduler = Scheduler(aio, n, inline=inline)
+
+    # like timeit, keep collections from landing in random runs
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    futures = [scheduler.add(nested(depth, io=io)) for _ in range(n)]
+    while not all(f.done() for f in futures):
+        for cqe in aio.dequeue(n):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(0)
+        aio.flush(0)
+    elapsed = time.perf_counter() - start
+    gc.enable()
+
+    expected = EchoCompletion("leaf") if io else "leaf"
+    assert all(f.result() == expected for f in futures)
+    return elapsed / n
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    for io in [False, True]:
+        for depth in [10, 50, 100]:
+            queued, inlined = (
+                min(run(depth, n, io=io, inline=inline) for _ in range(5)) for inline in [0, 128]
+            )
+            sys.stdout.write(
+                f"io={io!s:<5} depth={depth:<3} queued={queued * 1_000_000:.1f}us "
+                f"inline={inlined * 1_000_000:.1f}us speedup={queued / inlined:.2f}x\n"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from pio.scheduler import Computation, Scheduler
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pio.bus import CQE, SQE
+    from pio.metrics import Metrics
+    from pio.tracing import Tracer
+    from pio.typing import SubSystem
+
+
+@dataclass(frozen=True)
+class Park:
+    n: int
+
+    @property
+    def kind(self) -> str:
+        return "park"
+
+
+class ParkedAIO:
+    """AIO that never completes on its own, submissions stay parked until resolved."""
+
+    def __init__(self) -> None:
+        self.sqes: list[SQE] = []
+
+    def attach_subsystem(self, subsystem: SubSystem) -> None: ...
+    def attach_notifier(self, notify: Callable[[], None]) -> None: ...
+    def attach_metrics(self, metrics: Metrics) -> None: ...
+    def attach_tracer(self, tracer: Tracer) -> None: ...
+    def start(self) -> None: ...
+    def shutdown(self) -> None: ...
+    def flush(self, time: int) -> None: ...
+    def next_deadline(self) -> int | None: ...
+    def dispatch(self, sqe: SQE) -> None:
+        self.sqes.append(sqe)
+
+    def cancel(self, sqe: SQE) -> None: ...
+    def started(self, sqes: list[SQE]) -> None: ...
+
+    def dequeue(self, n: int) -> list[CQE]:
+        return []
+
+    def enqueue(self, cqe: tuple[CQE, str]) -> None: ...
+    def enqueue_many(self, cqes: list[tuple[CQE, str]], *, block: bool = True) -> int: ...
+
+
+def park(n: int) -> Computation[Park, int]:
+    p = yield Park(n)
+    v = yield p
+    return v
+
+
+def run(awaiting: int, ticks: int) -> float:
+    aio = ParkedAIO()
+    scheduler = Scheduler(aio, awaiting)
+    for i in range(awaiting):
+        scheduler.add(park(i))
+    scheduler.run_until_blocked(0)
+    assert len(aio.sqes) == awaiting
+
+    start = time.perf_counter()
+    for i in range(ticks):
+        sqe = aio.sqes.pop()
+        sqe.cb(i)
+        scheduler.run_until_blocked(i)
+    return (time.perf_counter() - start) / ticks
+
+
+def main() -> None:
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    for awaiting in [1_000, 10_000, 100_000]:
+        per_tick = run(awaiting, ticks)
+        sys.stdout.write(
+            f"awaiting={awaiting:<7} ticks={ticks} per_tick={per_tick * 1_000_000:.2f}us\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from pio import Pio
+from pio.aio import AIODst, AIOSystem
+from pio.scheduler import All, Computation, Scheduler
+from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+from pio.subsystems.function import FunctionSubsystem
+from pio.subsystems.timer import Sleep, TimerSubsystem
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pio.typing import AIO
+
+
+def nested(depth: int) -> Computation[Any, EchoCompletion]:
+    if depth == 0:
+        p = yield EchoSubmission("leaf")
+    else:
+        p = yield nested(depth - 1)
+    v = yield p
+    return v
+
+
+def fanout(width: int) -> Computation[EchoSubmission, list[Any]]:
+    v = yield All([EchoSubmission(str(i)) for i in range(width)])
+    return v
+
+
+def parked(ms: int) -> Computation[Sleep, int]:
+    p = yield Sleep(ms)
+    v = yield p
+    return v
+
+
+def echo(round_trips: int) -> Computation[EchoSubmission, int]:
+    for i in range(round_trips):
+        p = yield EchoSubmission(str(i))
+        v = yield p
+        assert isinstance(v, EchoCompletion)
+    return round_trips
+
+
+def function() -> Computation[Callable[[], int], int]:
+    p = yield lambda: 1
+    v = yield p
+    return v
+
+
+# every workload adds n computations at once, an op is one computation completing
+WORKLOADS: dict[str, Callable[[], Computation[Any, Any]]] = {
+    "nested": lambda: nested(50),
+    "fanout": lambda: fanout(100),
+    "parked": lambda: parked(1),
+    "echo": lambda: echo(10),
+    "function": function,
+}
+
+# room for every submission a run makes at once, the widest workload fans out 100 wide
+CAPACITY = 100
+
+
+@dataclass(frozen=True)
+class Result:
+    workload: str
+    target: str
+    n: int
+    ops_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    peak_memory_kb: float
+
+
+def attach(aio: AIO, pool: ThreadPoolExecutor | None, n: int) -> None:
+    aio.attach_subsystem(EchoSubsystem(aio, pool, n * CAPACITY))
+    aio.attach_subsystem(FunctionSubsystem(aio, pool, n * CAPACITY))
+    aio.attach_subsystem(TimerSubsystem(aio, pool, n * CAPACITY))
+
+
+def drive(aio: AIO, n: int, comps: list[Computation[Any, Any]]) -> list[float]:
+    scheduler = Scheduler(aio, n)
+    latencies: list[float] = []
+    futures: list[Future[Any]] = []
+    for comp in comps:
+        start = time.perf_counter()
+        f = scheduler.add(comp)
+        f.add_done_callback(lambda _, start=start: latencies.append(time.perf_counter() - start))
+        futures.append(f)
+
+    while len(latencies) < len(futures):
+        now = int(time.time() * 1_000)
+        for cqe in aio.dequeue(n):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(now)
+        aio.flush(now)
+
+    for f in futures:
+        f.result()
+    return latencies
+
+
+def run_dst(n: int, comps: list[Computation[Any, Any]]) -> list[float]:
+    aio = AIODst(random.Random(0), 0)
+    attach(aio, None, n)
+    return drive(aio, n, comps)
+
+
+def run_system(n: int, comps: list[Computation[Any, Any]]) -> list[float]:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, n * CAPACITY)
+    attach(aio, pool, n)
+    aio.start()
+    try:
+        return drive(aio, n, comps)
+    finally:
+        aio.shutdown()
+
+
+def run_pio(n: int, comps: list[Computation[Any, Any]]) -> list[float]:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, n * CAPACITY)
+    attach(aio, pool, n)
+    system = Pio(aio, n, n, wakeup=True)
+    system.start()
+
+    latencies: list[float] = []
+    futures: list[Future[Any]] = []
+    for comp in comps:
+        start = time.perf_counter()
+        f = system.add(comp)
+        f.add_done_callback(lambda _, start=start: latencies.append(time.perf_counter() - start))
+        futures.append(f)
+
+    wait(futures)
+    system.shutdown()
+    for f in futures:
+        f.result()
+    return latencies
+
+
+TARGETS: dict[str, Callable[[int, list[Computation[Any, Any]]], list[float]]] = {
+    "dst": run_dst,
+    "system": run_system,
+    "pio": run_pio,
+}
+
+
+def measure(workload: str, target: str, n: int, repeats: int) -> Result:
+    make, run = WORKLOADS[workload], TARGETS[target]
+
+    best = float("inf")
+    latencies: list[float] = []
+    for _ in range(repeats):
+        comps = [make() for _ in range(n)]
+        start = time.perf_counter()
+        samples = run(n, comps)
+        elapsed = time.perf_counter() - start
+        if elapsed < best:
+            best, latencies = elapsed, samples
+
+    # memory is measured in a separate run, tracing allocations skews the timings
+    comps = [make() for _ in range(n)]
+    tracemalloc.start()
+    run(n, comps)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return Result(
+        workload,
+        target,
+        n,
+        n / best,
+        statistics.median(latencies) * 1_000,
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1_000,
+        peak / 1_024,
+    )
+
+
+def commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(results: list[Result], baseline: Path, threshold: float) -> bool:
+    before = {
+        (r["workload"], r["target"]): r["ops_per_sec"]
+        for r in json.loads(baseline.read_text())["results"]
+    }
+
+    ok = True
+    for r in results:
+        if (ops := before.get((r.workload, r.target))) is None:
+            continue
+        change = r.ops_per_sec / ops - 1
+        regressed = change < -threshold
+        ok &= not regressed
+        sys.stdout.write(
+            f"{r.workload:<9} {r.target:<7} {change:+.1%}{' REGRESSION' if regressed else ''}\n"
+        )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pio benchmark suite")
+    parser.add_argument("-n", type=int, default=1_000, help="computations per run")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workload", action="append", choices=list(WORKLOADS))
+    parser.add_argument("--target", action="append", choices=list(TARGETS))
+    parser.add_argument("--out", type=Path, help="write results as json")
+    parser.add_argument("--compare", type=Path, help="json results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="tolerated slowdown")
+    args = parser.parse_args()
+
+    results: list[Result] = []
+    for workload in args.workload or WORKLOADS:
+        for target in args.target or TARGETS:
+            r = measure(workload, target, args.n, args.repeats)
+            results.append(r)
+            sys.stdout.write(
+                f"{r.workload:<9} {r.target:<7} n={r.n} ops/sec={r.ops_per_sec:,.0f} "
+                f"p50={r.p50_ms:.3f}ms p99={r.p99_ms:.3f}ms peak={r.peak_memory_kb:,.0f}KiB\n"
+            )
+
+    if args.out is not None:
+        args.out.write_text(
+            json.dumps(
+                {
+                    "commit": commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": [asdict(r) for r in results],
+                },
+                indent=2,
+            )
+        )
+
+    if args.compare is not None and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
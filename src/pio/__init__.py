@@ -1,36 +1,150 @@
 from __future__ import annotations
 
+import asyncio
+import queue
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Coroutine
 from threading import Event, Thread
+from time import perf_counter_ns
 from typing import TYPE_CHECKING, Any
 
+from pio.metrics import Metrics
 from pio.scheduler import Computation, Scheduler
 from pio.typing import AIO, Kind
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
     from concurrent.futures import Future
 
+    from pio.journal import Journal
+    from pio.tracing import Tracer
+
 
 class Pio:
     def __init__(
-        self, aio: AIO, size: int = 100, dequeue_size: int = 100, tick_freq: float = 0.1
+        self,
+        aio: AIO,
+        size: int = 100,
+        dequeue_size: int = 100,
+        tick_freq: float = 0.1,
+        *,
+        wakeup: bool = False,
+        metrics: Metrics | None = None,
+        tracer: Tracer | None = None,
+        journal: Journal | None = None,
     ) -> None:
         self._aio = aio
-        self._scheduler = Scheduler(aio, size)
         self._dequeue_size = dequeue_size
         self._tick_freq = tick_freq
 
+        # the scheduler and the aio record into the same registry as the loop itself
+        self._metrics = metrics if metrics is not None else Metrics()
+        self._aio.attach_metrics(self._metrics)
+        self._dequeued = self._metrics.histogram("pio_tick_completions")
+        self._tick_us = self._metrics.histogram("pio_tick_duration_us")
+
+        # tracing is opt-in, it records every step and submission
+        if tracer is not None:
+            self._aio.attach_tracer(tracer)
+
+        # in wakeup mode the loop blocks until a new computation or completion arrives
+        # instead of polling every tick_freq seconds.
+        self._wakeup = wakeup
+        self._wake = Event()
+        self._backlog = False
+        if wakeup:
+            self._scheduler = Scheduler(
+                aio, size, self._wake.set, self._metrics, tracer, journal=journal
+            )
+            self._aio.attach_notifier(self._wake.set)
+        else:
+            self._scheduler = Scheduler(
+                aio, size, metrics=self._metrics, tracer=tracer, journal=journal
+            )
+
+        # what a tick journaled is committed at its end, with a single fsync
+        self._journal = journal
+
         self._thread = Thread(target=self._loop, daemon=True)
         self._stop = Event()
         self._stopped = Event()
         self._stopped.set()
 
-    def add[I: Kind | Callable[[], Any], O: Kind | Any](self, comp: Computation[I, O]) -> Future[O]:
-        return self._scheduler.add(comp)
+    @property
+    def scheduler(self) -> Scheduler:
+        return self._scheduler
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    def add[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comp: Computation[I, O],
+        timeout: int | None = None,
+        *,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> Future[O]:
+        return self._scheduler.add(
+            comp, timeout, priority=priority, block=block, block_timeout=block_timeout
+        )
+
+    def add_many[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comps: Iterable[Computation[I, O]],
+        timeout: int | None = None,
+        *,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> list[Future[O]]:
+        return self._scheduler.add_many(
+            comps, timeout, priority=priority, block=block, block_timeout=block_timeout
+        )
+
+    def add_durable(
+        self,
+        name: str,
+        *args: Any,
+        timeout: int | None = None,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> Future[Any]:
+        return self._scheduler.add_durable(
+            name,
+            *args,
+            timeout=timeout,
+            priority=priority,
+            block=block,
+            block_timeout=block_timeout,
+        )
+
+    def recover(self) -> list[Future[Any]]:
+        return self._scheduler.recover()
+
+    async def add_async[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comp: Computation[I, O],
+        timeout: int | None = None,  # noqa: ASYNC109
+        *,
+        priority: int = 0,
+        block_timeout: float | None = None,
+    ) -> O:
+        try:
+            f = self.add(comp, timeout, priority=priority)
+        except queue.Full:
+            # wait for room off the event loop
+            f = await asyncio.to_thread(
+                self.add, comp, timeout, priority=priority, block=True, block_timeout=block_timeout
+            )
+        return await asyncio.wrap_future(f)
 
     def shutdown(self) -> None:
         self._stop.set()
+        self._wake.set()
         self._stopped.wait()
         self._thread.join()
         self._scheduler.shutdown()
@@ -45,15 +159,49 @@ class Pio:
 
     def _loop(self) -> None:
         while True:
+            if self._wakeup:
+                self._wake.clear()
+
             self.tick(int(time.time() * 1_000))
+            timeout = self._timeout()
+
+            if self._wakeup:
+                if self._stop.is_set() and self._scheduler.size() == 0:
+                    self._stopped.set()
+                    return
 
-            if self._stop.wait(self._tick_freq) and self._scheduler.size() == 0:
-                self._stopped.set()
-                return
+                # a full dequeue may have left completions behind, go again right away
+                if not self._backlog:
+                    self._wake.wait(timeout)
+
+            else:
+                if timeout is None or timeout > self._tick_freq:
+                    timeout = self._tick_freq
+
+                if self._stop.wait(timeout) and self._scheduler.size() == 0:
+                    self._stopped.set()
+                    return
+
+    def _timeout(self) -> float | None:
+        deadlines = [
+            d for d in (self._scheduler.next_deadline(), self._aio.next_deadline()) if d is not None
+        ]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) / 1_000 - time.time())
 
     def tick(self, time: int) -> None:
-        for cqe in self._aio.dequeue(self._dequeue_size):
+        start = perf_counter_ns()
+        cqes = self._aio.dequeue(self._dequeue_size)
+        self._backlog = len(cqes) >= self._dequeue_size
+        for cqe in cqes:
             cqe.cb(cqe.v)
 
         self._scheduler.run_until_blocked(time)
         self._aio.flush(time)
+        if self._journal is not None:
+            self._journal.commit()
+
+        self._dequeued.record(len(cqes))
+        self._tick_us.record((perf_counter_ns() - start) // 1_000)
+        self._metrics.tick(time)
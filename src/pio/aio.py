@@ -1,28 +1,203 @@
 from __future__ import annotations
 
 import queue
-from collections.abc import Callable
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Coroutine, Hashable
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 
 from pio.bus import CQE, SQE
+from pio.metrics import Counter, Histogram, Metrics
 
 if TYPE_CHECKING:
     import random
     from concurrent.futures import ThreadPoolExecutor
 
+    from pio.tracing import Tracer
     from pio.typing import SubSystem
 
 
+def _kind(v: Any) -> str:
+    match v:
+        case Callable():
+            return "function"
+        case Coroutine():
+            return "asyncio"
+        case _:
+            return v.kind
+
+
+class CompletionQueue[T]:
+    """Bounded multi-producer, single-consumer queue that moves items in batches.
+
+    Producers append whole batches under one lock acquisition and the consumer takes
+    everything available in a single swap of the underlying buffer. Producers block
+    while the queue is at capacity, unless they put without blocking.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        assert maxsize > 0, "maxsize must be positive"
+
+        self.maxsize = maxsize
+        self._items: list[T] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._is_shutdown = False
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def put(self, item: T) -> None:
+        self.put_many([item])
+
+    def put_many(self, items: list[T], *, block: bool = True) -> int:
+        """Put items in order, returns how many were put, all of them when blocking."""
+        i = 0
+        with self._changed:
+            while i < len(items):
+                while block and len(self._items) >= self.maxsize and not self._is_shutdown:
+                    self._changed.wait()
+                if self._is_shutdown:
+                    raise queue.ShutDown
+
+                room = self.maxsize - len(self._items)
+                if room == 0:
+                    break
+                self._items.extend(items[i : i + room])
+                i += room
+        return min(i, len(items))
+
+    def get_many(self, n: int) -> list[T]:
+        """Take up to n items without blocking, raises ShutDown once shut down and drained."""
+        with self._changed:
+            if not self._items:
+                if self._is_shutdown:
+                    raise queue.ShutDown
+                return []
+
+            if n >= len(self._items):
+                items, self._items = self._items, []
+            else:
+                items = self._items[:n]
+                del self._items[:n]
+
+            self._changed.notify_all()
+            return items
+
+    def shutdown(self) -> None:
+        with self._changed:
+            self._is_shutdown = True
+            self._changed.notify_all()
+
+    def join(self) -> None:
+        with self._changed:
+            while self._items:
+                self._changed.wait()
+
+
+class _Cache:
+    """Single-flight table and optional TTL/LRU result cache for one subsystem kind.
+
+    A flight is the list of submissions waiting on the same key, the first of which is
+    the one actually dispatched.
+    """
+
+    __slots__ = ("flights", "maxsize", "results", "ttl")
+
+    def __init__(self, maxsize: int, ttl: int | None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.flights: dict[Hashable, list[SQE]] = {}
+        self.results: OrderedDict[Hashable, tuple[int | None, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, time: int) -> tuple[bool, Any]:
+        # raises TypeError for unhashable submissions, which bypass the cache
+        if (entry := self.results.get(key)) is None:
+            return False, None
+
+        expires, v = entry
+        if expires is not None and time >= expires:
+            del self.results[key]
+            return False, None
+
+        self.results.move_to_end(key)
+        return True, v
+
+    def put(self, key: Hashable, v: Any, time: int) -> None:
+        if self.maxsize == 0:
+            return
+
+        self.results[key] = (time + self.ttl if self.ttl is not None else None, v)
+        self.results.move_to_end(key)
+        while len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+
+@dataclass(slots=True)
+class _KindMetrics:
+    submitted: Counter
+    completed: Counter
+    rejected: Counter
+    cancelled: Counter
+    coalesced: Counter
+    cached: Counter
+    parked: Counter
+    latency: Histogram
+
+    @classmethod
+    def of(cls, metrics: Metrics, subsystem: SubSystem, parked: deque[SQE]) -> _KindMetrics:
+        kind = subsystem.kind
+        metrics.gauge("pio_subsystem_depth", lambda: subsystem.depth, kind=kind)
+        metrics.gauge("pio_aio_parked", parked.__len__, kind=kind)
+        return cls(
+            metrics.counter("pio_aio_submitted_total", kind=kind),
+            metrics.counter("pio_aio_completed_total", kind=kind),
+            metrics.counter("pio_aio_rejected_total", kind=kind),
+            metrics.counter("pio_aio_cancelled_total", kind=kind),
+            metrics.counter("pio_aio_coalesced_total", kind=kind),
+            metrics.counter("pio_aio_cache_hits_total", kind=kind),
+            metrics.counter("pio_aio_parked_total", kind=kind),
+            metrics.histogram("pio_aio_latency_us", kind=kind),
+        )
+
+
 class AIOSystem:
-    def __init__(self, pool: ThreadPoolExecutor, size: int = 100) -> None:
+    def __init__(
+        self, pool: ThreadPoolExecutor, size: int = 100, *, overflow: float | None = None
+    ) -> None:
         assert size > 0, "size must be positive"
+        assert overflow is None or overflow >= 0, "overflow must not be negative"
 
         self._pool = pool
-        self._cq = queue.Queue[tuple[CQE, str]](size)
+        self._cq = CompletionQueue[tuple[CQE, str]](size)
         self._subsystems: dict[str, SubSystem] = {}
+        self._notify: Callable[[], None] | None = None
+
+        # submissions a subsystem has no room for are parked, up to overflow per kind, and
+        # handed over in order on the next flushes instead of failing. overflow defaults
+        # to the size of the subsystem, math.inf parks without limit.
+        self._overflow = overflow
+        self._parked: dict[str, deque[SQE]] = {}
+
+        # submissions are timed from dispatch until their completion is dequeued, both on
+        # the loop thread, so the metrics are only ever updated from there.
+        self._kinds: dict[str, _KindMetrics] = {}
+        self._dispatched: dict[Callable[[Any], None], int] = {}
+        self.attach_metrics(Metrics())
+        self._tracer: Tracer | None = None
+
+        # caches are only touched on the loop thread too, flights are found again by the
+        # callback of the submission that was dispatched for them
+        self._caches: dict[str, _Cache] = {}
+        self._leaders: dict[Callable[[Any], None], tuple[_Cache, Hashable]] = {}
+        self._time = 0
+        # completions of followers that didn't fit in a dequeue, they go first in the next
+        self._followers: deque[CQE] = deque()
 
     @property
-    def cq(self) -> queue.Queue[tuple[CQE, str]]:
+    def cq(self) -> CompletionQueue[tuple[CQE, str]]:
         return self._cq
 
     def attach_subsystem(self, subsystem: SubSystem) -> None:
@@ -31,6 +206,41 @@ class AIOSystem:
         )
         assert subsystem.kind not in self._subsystems, "subsystem is already registered."
         self._subsystems[subsystem.kind] = subsystem
+        self._parked[subsystem.kind] = deque()
+        self._kinds[subsystem.kind] = _KindMetrics.of(
+            self._metrics, subsystem, self._parked[subsystem.kind]
+        )
+
+    def attach_notifier(self, notify: Callable[[], None]) -> None:
+        self._notify = notify
+
+    def attach_metrics(self, metrics: Metrics) -> None:
+        self._metrics = metrics
+        metrics.gauge("pio_aio_completion_queue_depth", self._cq.qsize)
+        self._kinds = {
+            kind: _KindMetrics.of(metrics, subsystem, self._parked[kind])
+            for kind, subsystem in self._subsystems.items()
+        }
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    def attach_tracer(self, tracer: Tracer) -> None:
+        self._tracer = tracer
+
+    def attach_cache(self, kind: str, *, maxsize: int = 0, ttl: int | None = None) -> None:
+        """Coalesce concurrent identical submissions of a kind into a single one.
+
+        With maxsize, successful completions are also cached by submission for ttl
+        milliseconds, or until evicted when ttl is None. Submissions of the kind must be
+        idempotent and their completions are shared, so both should be immutable.
+        Unhashable submissions are dispatched as usual.
+        """
+        assert kind in self._subsystems, "subsystem is not registered."
+        assert maxsize >= 0, "maxsize must not be negative"
+        assert ttl is None or ttl > 0, "ttl must be positive"
+        self._caches[kind] = _Cache(maxsize, ttl)
 
     def start(self) -> None:
         for subsystem in self._subsystems.values():
@@ -45,33 +255,157 @@ class AIOSystem:
         self._pool.shutdown()
 
     def flush(self, time: int) -> None:
+        self._time = time
+        for kind, parked in self._parked.items():
+            while parked and self._subsystems[kind].enqueue(parked[0]):
+                parked.popleft()
+                self._kinds[kind].submitted.inc()
+
         for subsystem in self._subsystems.values():
             subsystem.flush(time)
 
-    def dispatch(self, sqe: SQE) -> None:
-        match sqe.v:
-            case Callable():
-                subsystem = self._subsystems["function"]
-            case _:
-                subsystem = self._subsystems[sqe.v.kind]
+    def next_deadline(self) -> int | None:
+        if self._followers:
+            return 0
+        return min(
+            (d for s in self._subsystems.values() if (d := s.next_deadline()) is not None),
+            default=None,
+        )
 
-        if not subsystem.enqueue(sqe):
+    def dispatch(self, sqe: SQE) -> None:
+        kind = _kind(sqe.v)
+        if (cache := self._caches.get(kind)) is not None:
+            try:
+                hit, v = cache.get(sqe.v, self._time)
+            except TypeError:
+                cache = None
+            else:
+                flight = None if hit else cache.flights.get(sqe.v)
+                if (hit or flight is not None) and self._tracer is not None:
+                    # it never reaches a subsystem, so there's no span to link it to
+                    self._tracer.cancelled(sqe.cb)
+                if hit:
+                    self._kinds[kind].cached.inc()
+                    sqe.cb(v)
+                    return
+                if flight is not None:
+                    self._kinds[kind].coalesced.inc()
+                    flight.append(sqe)
+                    return
+
+        if self._tracer is not None:
+            # a worker may pick the submission up before enqueue returns
+            self._tracer.dispatched(sqe.cb, kind)
+
+        # parked submissions of the kind go first
+        subsystem = self._subsystems[kind]
+        overflow = subsystem.size if self._overflow is None else self._overflow
+        if not (parked := self._parked[kind]) and subsystem.enqueue(sqe):
+            self._kinds[kind].submitted.inc()
+        elif len(parked) < overflow:
+            parked.append(sqe)
+            self._kinds[kind].parked.inc()
+        else:
+            if self._tracer is not None:
+                self._tracer.cancelled(sqe.cb)
+            self._kinds[kind].rejected.inc()
             sqe.cb(Exception("aio submission queue full"))
+            return
+
+        self._dispatched[sqe.cb] = time.perf_counter_ns()
+        if cache is not None:
+            cache.flights[sqe.v] = [sqe]
+            self._leaders[sqe.cb] = (cache, sqe.v)
+
+    def cancel(self, sqe: SQE) -> None:
+        kind = _kind(sqe.v)
+        if (cache := self._caches.get(kind)) is not None and self._leave(cache, sqe):
+            return
+
+        if (parked := self._parked[kind]) and sqe in parked:
+            parked.remove(sqe)
+        else:
+            self._subsystems[kind].cancel(sqe)
+        if self._dispatched.pop(sqe.cb, None) is not None:
+            self._kinds[kind].cancelled.inc()
+        if self._tracer is not None:
+            self._tracer.cancelled(sqe.cb)
+
+    def started(self, sqes: list[SQE]) -> None:
+        if self._tracer is not None:
+            for sqe in sqes:
+                self._tracer.started(sqe.cb)
 
     def dequeue(self, n: int) -> list[CQE]:
         cqes: list[CQE] = []
-        for _ in range(n):
-            try:
-                cqe, kind = self._cq.get_nowait()
-            except queue.Empty:
-                break
-
+        while self._followers and len(cqes) < n:
+            cqes.append(self._followers.popleft())
+        if len(cqes) == n:
+            return cqes
+
+        try:
+            completed = self._cq.get_many(n - len(cqes))
+        except queue.ShutDown:
+            # shut down and drained, there's nothing left to hand out
+            completed = []
+
+        now = time.perf_counter_ns()
+        for cqe, kind in completed:
             cqes.append(cqe)
-            self._cq.task_done()
-        return cqes
+            if (metrics := self._kinds.get(kind)) is not None:
+                metrics.completed.inc()
+                if (start := self._dispatched.pop(cqe.cb, None)) is not None:
+                    metrics.latency.record((now - start) // 1_000)
+            if self._tracer is not None:
+                self._tracer.dequeued(cqe.cb)
+            if self._leaders and (leader := self._leaders.pop(cqe.cb, None)) is not None:
+                cache, key = leader
+                flight = cache.flights.pop(key)
+                if not isinstance(cqe.v, Exception):
+                    cache.put(key, cqe.v, self._time)
+                cqes.extend(CQE(cqe.v, follower.cb) for follower in flight[1:])
+
+        # at most n are handed out, followers past that wait for the next dequeue
+        self._followers.extend(cqes[n:])
+        return cqes[:n]
+
+    def _leave(self, cache: _Cache, sqe: SQE) -> bool:
+        """Remove a cancelled submission from its flight, true if nothing is left to cancel."""
+        try:
+            flight = cache.flights.get(sqe.v)
+        except TypeError:
+            return False
+        if flight is None:
+            return False
+
+        if flight[0] is not sqe:
+            if sqe in flight:
+                flight.remove(sqe)
+                return True
+            return False
+        if len(flight) > 1:
+            # the others still wait on it, the scheduler ignores its own completion
+            return True
+
+        del cache.flights[sqe.v]
+        del self._leaders[sqe.cb]
+        return False
 
     def enqueue(self, cqe: tuple[CQE, str]) -> None:
+        if self._tracer is not None:
+            self._tracer.completed(cqe[0].cb)
         self._cq.put(cqe)
+        if self._notify is not None:
+            self._notify()
+
+    def enqueue_many(self, cqes: list[tuple[CQE, str]], *, block: bool = True) -> int:
+        if self._tracer is not None:
+            for cqe, _ in cqes:
+                self._tracer.completed(cqe.cb)
+        n = self._cq.put_many(cqes, block=block)
+        if self._notify is not None:
+            self._notify()
+        return n
 
 
 class AIODst:
@@ -86,6 +420,15 @@ class AIODst:
         assert subsystem.kind not in self._subsystems, "subsystem is already registered."
         self._subsystems[subsystem.kind] = subsystem
 
+    def attach_notifier(self, notify: Callable[[], None]) -> None:
+        return
+
+    def attach_metrics(self, metrics: Metrics) -> None:
+        return
+
+    def attach_tracer(self, tracer: Tracer) -> None:
+        return
+
     def check(self, value: Any) -> Any:
         def _(result: Any | Exception) -> None: ...
 
@@ -104,9 +447,7 @@ class AIODst:
     def flush(self, time: int) -> None:
         flush: dict[str, list[SQE]] = {}
         for sqe in self._sqes:
-            flush.setdefault(
-                sqe.v.kind if not isinstance(sqe.v, Callable) else "function", []
-            ).append(sqe)
+            flush.setdefault(_kind(sqe.v), []).append(sqe)
 
         for kind, sqes in flush.items():
             assert kind in self._subsystems, "invalid aio submission"
@@ -146,9 +487,27 @@ class AIODst:
                     self.enqueue((cqe, "dst"))
         self._sqes.clear()
 
+        for subsystem in self._subsystems.values():
+            subsystem.flush(time)
+
+    def next_deadline(self) -> int | None:
+        return min(
+            (d for s in self._subsystems.values() if (d := s.next_deadline()) is not None),
+            default=None,
+        )
+
     def dispatch(self, sqe: SQE) -> None:
         self._sqes.insert(self._r.randrange(len(self._sqes) + 1), sqe)
 
+    def cancel(self, sqe: SQE) -> None:
+        if sqe in self._sqes:
+            self._sqes.remove(sqe)
+        else:
+            self._subsystems[_kind(sqe.v)].cancel(sqe)
+
+    def started(self, sqes: list[SQE]) -> None:
+        return
+
     def dequeue(self, n: int) -> list[CQE]:
         cqes = self._cqes[: min(n, len(self._cqes))]
         self._cqes = self._cqes[min(n, len(self._cqes)) :]
@@ -156,3 +515,7 @@ class AIODst:
 
     def enqueue(self, cqe: tuple[CQE, str]) -> None:
         self._cqes.append(cqe[0])
+
+    def enqueue_many(self, cqes: list[tuple[CQE, str]], *, block: bool = True) -> int:
+        self._cqes.extend(cqe for cqe, _ in cqes)
+        return len(cqes)
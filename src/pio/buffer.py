@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Self
+
+
+def _release(shm: SharedMemory, *, unlink: bool) -> None:
+    shm.close()
+    if unlink:
+        shm.unlink()
+
+
+class SharedBuffer:
+    """A byte buffer backed by shared memory.
+
+    Pickling a SharedBuffer sends its name, not its contents, so it can be carried in
+    SQEs and CQEs across process boundaries without copying. A pickled buffer attaches
+    without ownership, ownership only moves through the handle returned by send. The
+    owner unlinks the segment when it releases the buffer, or when the buffer is garbage
+    collected once the completion holding it has been consumed. A pickled buffer can't be
+    loaded once the segment is unlinked, so buffers must not be persisted and the
+    journal doesn't log them.
+
+    On Windows the segment only lives while some process holds it open, so the receiver
+    has to attach before the sender drops its handle.
+    """
+
+    def __init__(self, shm: SharedMemory, size: int, *, owner: bool) -> None:
+        self._shm = shm
+        self._size = size
+        self._owner = owner
+        self._finalizer = weakref.finalize(self, _release, shm, unlink=owner)
+
+    @classmethod
+    def create(cls, size: int) -> Self:
+        assert size >= 0, "size must not be negative"
+        return cls(SharedMemory(create=True, size=max(size, 1), track=False), size, owner=True)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | bytearray | memoryview) -> Self:
+        buf = cls.create(len(data))
+        buf.buf[:] = data
+        return buf
+
+    @classmethod
+    def attach(cls, name: str, size: int, *, owner: bool = False) -> Self:
+        return cls(SharedMemory(name=name, track=False), size, owner=owner)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def buf(self) -> memoryview:
+        assert self._finalizer.alive, "buffer is released"
+        buf = self._shm.buf
+        assert buf is not None
+        return buf[: self._size]
+
+    def release(self) -> None:
+        self._finalizer()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __buffer__(self, flags: int) -> memoryview:
+        return self.buf
+
+    def __bytes__(self) -> bytes:
+        return self.buf.tobytes()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.release()
+
+    def send(self) -> SharedBufferHandle:
+        assert self._owner, "buffer is not the owner"
+        # hand ownership to the receiver, this side only closes its mapping
+        self._owner = False
+        self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, _release, self._shm, unlink=False)
+        return SharedBufferHandle(self)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_attach, (self.name, self._size, False))
+
+
+class SharedBufferHandle:
+    """The ownership of a SharedBuffer in transit, it unpickles as the owning buffer.
+
+    The handle keeps the sending side's mapping open, it is meant to be pickled once.
+    """
+
+    __slots__ = ("_buffer",)
+
+    def __init__(self, buffer: SharedBuffer) -> None:
+        self._buffer = buffer
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_attach, (self._buffer.name, len(self._buffer), True))
+
+
+def _attach(name: str, size: int, owner: bool) -> SharedBuffer:  # noqa: FBT001
+    try:
+        return SharedBuffer.attach(name, size, owner=owner)
+    except FileNotFoundError as e:
+        msg = f"shared buffer {name} was released by its owner before it was loaded"
+        raise FileNotFoundError(msg) from e
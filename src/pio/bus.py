@@ -6,19 +6,20 @@ from typing import TYPE_CHECKING, Any
 from pio.typing import Kind
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Coroutine
 
 
 type Callback[O] = Callable[[O | Any | Exception], None]
 
 
-@dataclass(frozen=True)
-class SQE[I: Kind | Callable[[], Any], O: Kind | Any]:
+@dataclass(frozen=True, slots=True)
+class SQE[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any]:
     v: I
     cb: Callback[O]
+    priority: int = 0
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CQE[O: Kind | Any]:
     v: O | Exception
     cb: Callback[O]
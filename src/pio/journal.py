@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import io
+import os
+import pickle
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from pio.buffer import SharedBuffer
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pio.scheduler import Computation
+
+
+# every record is a header of kind, payload length and crc32 of the payload, followed
+# by the payload. ids and keys are varints, values and arguments are pickled.
+_HEADER = struct.Struct("<BII")
+_BEGIN = 1
+_RESULT = 2
+_END = 3
+
+
+def _varint(n: int, out: bytearray) -> None:
+    while n >= 0x80:  # noqa: PLR2004
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: bytes, i: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:  # noqa: PLR2004
+            return n, i
+        shift += 7
+
+
+def _record(kind: int, payload: bytes | bytearray, out: bytearray) -> None:
+    out += _HEADER.pack(kind, len(payload), zlib.crc32(payload))
+    out += payload
+
+
+class _Pickler(pickle.Pickler):
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, SharedBuffer):
+            # only valid while its segment exists, it can't be loaded after a restart
+            msg = "shared buffers can't be journaled"
+            raise TypeError(msg)
+        return NotImplemented
+
+
+def _dumps(v: Any) -> bytes:
+    f = io.BytesIO()
+    _Pickler(f).dump(v)
+    return f.getvalue()
+
+
+class Journal:
+    """Append-only log of durable computations and of the results of their submissions.
+
+    A durable computation is built by a registered factory from picklable arguments, so
+    it can be built again after a restart. Every submission it makes, directly or from
+    the computations it spawns, is keyed by its position in the tree of spawns, and its
+    result is logged once it completes. Recovering re-runs the unfinished computations
+    and hands them the logged results instead of dispatching those submissions again.
+
+    Records are buffered and written with a single fsync per commit, which Pio does
+    once per tick. Submissions in flight at a crash run again, and replay assumes that
+    computations only branch on the results they are sent, not on timing.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._factories: dict[str, Callable[..., Computation[Any, Any]]] = {}
+
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+
+        self._pending: dict[int, tuple[str, tuple[Any, ...]]] = {}
+        # results stay pickled until they are replayed, results of finished computations
+        # are never loaded
+        self._results: dict[int, dict[tuple[int, ...], bytes]] = {}
+        self._next = self._load()
+        self._file = self._path.open("ab")
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def register(self, name: str, factory: Callable[..., Computation[Any, Any]]) -> None:
+        assert name not in self._factories, "factory is already registered."
+        self._factories[name] = factory
+
+    def factory(self, name: str) -> Callable[..., Computation[Any, Any]]:
+        assert name in self._factories, f"no factory registered as {name}."
+        return self._factories[name]
+
+    def begin(self, name: str, args: tuple[Any, ...]) -> int:
+        assert name in self._factories, f"no factory registered as {name}."
+        payload = pickle.dumps((name, args))
+        with self._lock:
+            i = self._next
+            self._next += 1
+
+            out = bytearray()
+            _varint(i, out)
+            _record(_BEGIN, out + payload, self._buffer)
+        return i
+
+    def record(self, key: tuple[int, ...], v: Any) -> None:
+        try:
+            payload = _dumps(v)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            # not durable, the submission runs again on replay
+            return
+
+        out = bytearray()
+        _varint(len(key), out)
+        for n in key:
+            _varint(n, out)
+        with self._lock:
+            _record(_RESULT, out + payload, self._buffer)
+
+    def end(self, i: int) -> None:
+        self._results.pop(i, None)
+        out = bytearray()
+        _varint(i, out)
+        with self._lock:
+            _record(_END, out, self._buffer)
+
+    def recover(self) -> list[tuple[int, str, tuple[Any, ...]]]:
+        """The computations left unfinished by the previous run, handed out once."""
+        pending = [(i, name, args) for i, (name, args) in self._pending.items()]
+        self._pending.clear()
+        return pending
+
+    def replay(self, key: tuple[int, ...]) -> tuple[Any] | None:
+        if (results := self._results.get(key[0])) is None or key not in results:
+            return None
+        try:
+            return (pickle.loads(results.pop(key)),)  # noqa: S301
+        except Exception:
+            # can't be loaded anymore, the submission runs again
+            return None
+
+    def commit(self) -> None:
+        with self._lock:
+            if not self._buffer:
+                return
+            buffer, self._buffer = self._buffer, bytearray()
+
+        self._file.write(buffer)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self.commit()
+        self._file.close()
+
+    def _load(self) -> int:
+        """Read the previous run back and rewrite the file with what is still unfinished."""
+        if not self._path.exists():
+            return 0
+
+        data = self._path.read_bytes()
+        begins: dict[int, bytes] = {}
+        results: dict[int, list[bytes]] = {}
+        last = -1
+
+        i = 0
+        while i + _HEADER.size <= len(data):
+            kind, n, crc = _HEADER.unpack_from(data, i)
+            payload = data[i + _HEADER.size : i + _HEADER.size + n]
+            if len(payload) < n or zlib.crc32(payload) != crc:
+                # a torn write at the crash, nothing after it was committed
+                break
+            i += _HEADER.size + n
+
+            if kind == _BEGIN:
+                root, _ = _read_varint(payload, 0)
+                begins[root] = payload
+                last = max(last, root)
+            elif kind == _RESULT:
+                count, j = _read_varint(payload, 0)
+                key: list[int] = []
+                for _ in range(count):
+                    k, j = _read_varint(payload, j)
+                    key.append(k)
+                results.setdefault(key[0], []).append(payload)
+                self._results.setdefault(key[0], {})[tuple(key)] = payload[j:]
+            elif kind == _END:
+                root, _ = _read_varint(payload, 0)
+                begins.pop(root, None)
+                results.pop(root, None)
+                self._results.pop(root, None)
+            else:
+                break
+
+        out = bytearray()
+        for root, payload in begins.items():
+            _, j = _read_varint(payload, 0)
+            self._pending[root] = pickle.loads(payload[j:])  # noqa: S301
+            _record(_BEGIN, payload, out)
+            for result in results.get(root, []):
+                _record(_RESULT, result, out)
+        self._results = {root: self._results.get(root, {}) for root in begins}
+
+        tmp = self._path.with_suffix(self._path.suffix + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(out)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(self._path)
+        return last + 1
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+type Labels = tuple[tuple[str, str], ...]
+
+# histogram buckets are exact below 2**_SUB_BITS, above that every power of two is split
+# into 2**_SUB_BITS linear buckets, which bounds the relative error to about 6%.
+_SUB_BITS = 4
+_SUB = 1 << _SUB_BITS
+
+
+def _index(v: int) -> int:
+    if v < _SUB:
+        return max(v, 0)
+    shift = v.bit_length() - _SUB_BITS - 1
+    return (shift + 1) * _SUB + (v >> shift) - _SUB
+
+
+def _lower(i: int) -> int:
+    if i < _SUB:
+        return i
+    shift = i // _SUB - 1
+    return (i % _SUB + _SUB) << shift
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, n: int = 1) -> None:
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("_fn", "value")
+
+    def __init__(self, fn: Callable[[], float] | None = None) -> None:
+        self._fn = fn
+        self.value: float = 0
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def read(self) -> float:
+        return self._fn() if self._fn is not None else self.value
+
+
+class Histogram:
+    """Log-linear histogram of non-negative integers in the style of HdrHistogram.
+
+    Recording is an index computation and a list increment, percentiles are answered
+    from the bucket counts with a bounded relative error.
+    """
+
+    __slots__ = ("_counts", "count", "max", "sum")
+
+    def __init__(self) -> None:
+        self._counts: list[int] = []
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def record(self, v: int) -> None:
+        i = _index(v)
+        if i >= len(self._counts):
+            self._counts.extend([0] * (i + 1 - len(self._counts)))
+        self._counts[i] += 1
+        self.count += 1
+        self.sum += v
+        self.max = max(self.max, v)
+
+    def percentile(self, q: float) -> int:
+        assert 0 <= q <= 100, "percentile must be between 0 and 100"  # noqa: PLR2004
+        if self.count == 0:
+            return 0
+
+        rank = max(1, round(q / 100 * self.count))
+        seen = 0
+        for i, n in enumerate(self._counts):
+            seen += n
+            if seen >= rank:
+                return min(_lower(i + 1) - 1, self.max)
+        return self.max
+
+    def buckets(self) -> list[tuple[int, int]]:
+        """Upper bound and cumulative count of every non-empty bucket."""
+        buckets: list[tuple[int, int]] = []
+        seen = 0
+        for i, n in enumerate(self._counts):
+            if n:
+                seen += n
+                buckets.append((_lower(i + 1) - 1, seen))
+        return buckets
+
+
+def _series(name: str, labels: Labels, extra: Labels = ()) -> str:
+    labels += extra
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Registry of counters, gauges and histograms shared by the runtime components.
+
+    Metrics are plain objects updated in place by the thread that owns them, usually
+    the Pio loop thread, so recording costs no locking. Gauges may be backed by a
+    callable that is only evaluated when a snapshot is taken.
+    """
+
+    def __init__(self, export_interval: int = 10_000) -> None:
+        assert export_interval > 0, "export interval must be positive"
+
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, Labels], Counter] = {}
+        self._gauges: dict[tuple[str, Labels], Gauge] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+
+        self._exporters: list[Callable[[dict[str, float]], None]] = []
+        self._export_interval = export_interval
+        self._next_export: int | None = None
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (counter := self._counters.get(key)) is None:
+                counter = self._counters[key] = Counter()
+            return counter
+
+    def gauge(self, name: str, fn: Callable[[], float] | None = None, **labels: str) -> Gauge:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (gauge := self._gauges.get(key)) is None:
+                gauge = self._gauges[key] = Gauge(fn)
+            return gauge
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (histogram := self._histograms.get(key)) is None:
+                histogram = self._histograms[key] = Histogram()
+            return histogram
+
+    def attach_exporter(self, export: Callable[[dict[str, float]], None]) -> None:
+        self._exporters.append(export)
+
+    def tick(self, time: int) -> None:
+        if not self._exporters:
+            return
+        if self._next_export is None:
+            self._next_export = time + self._export_interval
+        elif time >= self._next_export:
+            self._next_export = time + self._export_interval
+            self.export()
+
+    def export(self) -> None:
+        snapshot = self.snapshot()
+        for export in self._exporters:
+            export(snapshot)
+
+    def snapshot(self) -> dict[str, float]:
+        """Flat view of every series, histograms as count, sum, max, p50, p90 and p99."""
+        with self._lock:
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+            histograms = list(self._histograms.items())
+
+        snapshot: dict[str, float] = {}
+        for (name, labels), counter in counters:
+            snapshot[_series(name, labels)] = counter.value
+        for (name, labels), gauge in gauges:
+            snapshot[_series(name, labels)] = gauge.read()
+        for (name, labels), histogram in histograms:
+            snapshot[_series(f"{name}_count", labels)] = histogram.count
+            snapshot[_series(f"{name}_sum", labels)] = histogram.sum
+            snapshot[_series(f"{name}_max", labels)] = histogram.max
+            for q in (50, 90, 99):
+                snapshot[_series(f"{name}_p{q}", labels)] = histogram.percentile(q)
+        return snapshot
+
+    def prometheus(self) -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self._histograms.items())
+
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counter in counters:
+            header(name, "counter")
+            lines.append(f"{_series(name, labels)} {counter.value}")
+        for (name, labels), gauge in gauges:
+            header(name, "gauge")
+            lines.append(f"{_series(name, labels)} {gauge.read():g}")
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            for le, n in histogram.buckets():
+                lines.append(f"{_series(f'{name}_bucket', labels, (('le', str(le)),))} {n}")
+            lines.append(
+                f"{_series(f'{name}_bucket', labels, (('le', '+Inf'),))} {histogram.count}"
+            )
+            lines.append(f"{_series(f'{name}_sum', labels)} {histogram.sum}")
+            lines.append(f"{_series(f'{name}_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
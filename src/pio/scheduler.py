@@ -1,38 +1,138 @@
 from __future__ import annotations
 
 import contextlib
+import heapq
+import itertools
 import queue
 from collections import deque
-from collections.abc import Callable, Generator
-from concurrent.futures import Future
-from typing import Any, assert_never
+from collections.abc import Callable, Coroutine, Generator
+from concurrent.futures import CancelledError, Future, InvalidStateError
+from functools import partial
+from time import perf_counter_ns, thread_time_ns
+from types import GeneratorType
+from typing import TYPE_CHECKING, Any, assert_never
 
 from pio.bus import SQE
+from pio.metrics import Metrics
 from pio.typing import AIO, Kind
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable
 
-class Promise: ...
+    from pio.journal import Journal
+    from pio.tracing import Tracer
 
 
-type Yieldable[I: Kind | Callable[[], Any], O: Kind | Any] = Computation[I, O] | Promise | I
-type Computation[I: Kind | Callable[[], Any], O: Kind | Any] = Generator[Yieldable[I, O], Any, O]
+class Promise:
+    __slots__ = ()
+
+
+class Timeout:
+    __slots__ = ("ms", "promise")
+
+    def __init__(self, promise: Promise, ms: int) -> None:
+        self.promise = promise
+        self.ms = ms
+
+
+def _untimed(items: list[Any]) -> bool:
+    return not any(isinstance(item, Timeout) for item in items)
+
+
+class All:
+    """Resumes with the list of results once every item succeeds, or with the first failure."""
+
+    __slots__ = ("items",)
+
+    def __init__(self, items: list[Any]) -> None:
+        assert _untimed(items), "items must not be timeouts"
+        self.items = items
+
+
+class AnyOf:
+    """Resumes with the first successful result, or with an ExceptionGroup if all fail."""
+
+    __slots__ = ("items",)
+
+    def __init__(self, items: list[Any]) -> None:
+        assert len(items) > 0, "items must not be empty"
+        assert _untimed(items), "items must not be timeouts"
+        self.items = items
+
+
+class Race:
+    """Resumes with the outcome of the first item to settle, successful or not."""
+
+    __slots__ = ("items",)
+
+    def __init__(self, items: list[Any]) -> None:
+        assert len(items) > 0, "items must not be empty"
+        assert _untimed(items), "items must not be timeouts"
+        self.items = items
+
+
+type Combinator = All | AnyOf | Race
+type Yieldable[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any] = (
+    Computation[I, O] | Promise | Timeout | Combinator | I
+)
+type Computation[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any] = Generator[
+    Yieldable[I, O], Any, O
+]
 
 
 class _FinalValue:
+    __slots__ = ("v",)
+
     def __init__(self, v: Any | Exception) -> None:
         self.v = v
 
 
 class _InternalComputation:
+    __slots__ = (
+        "_final",
+        "_pend",
+        "awaiting",
+        "comp",
+        "final",
+        "group",
+        "index",
+        "key",
+        "next",
+        "priority",
+        "spawned",
+        "sqe",
+        "timeout",
+    )
+
     def __init__(self, comp: Computation) -> None:
         self.comp = comp
         self.next: Any | Exception | Promise | None = None
         self.final: _FinalValue | None = None
 
-        self._pend: list[Promise] = []
+        # the child this computation is blocked on and, for io children, their submission
+        self.awaiting: _InternalComputation | None = None
+        self.sqe: SQE | None = None
+
+        # set on the items of a combinator
+        self.group: _InternalGroup | None = None
+        self.index = 0
+
+        self.timeout: int | None = None
+        self.priority = 0
+
+        # position in the tree of a durable computation, its root's journal id first
+        self.key: tuple[int, ...] | None = None
+        self.spawned = 0
+
+        # promises handed out but not awaited yet, only allocated once there is one
+        self._pend: list[Promise] | None = None
         self._final: _FinalValue | None = None
 
-    def send(self) -> Yieldable | _FinalValue:
+    def drop_pending(self) -> list[Promise]:
+        pend, self._pend = self._pend, None
+        return pend or []
+
+    def send(self) -> Yieldable | _FinalValue:  # noqa: PLR0911
         if self._final is not None:
             if self._pend:
                 return self._pend.pop()
@@ -43,7 +143,10 @@ class _InternalComputation:
                 case Exception():
                     yielded = self.comp.throw(self.next)
                 case Promise():
-                    self._pend.append(self.next)
+                    if self._pend is None:
+                        self._pend = [self.next]
+                    else:
+                        self._pend.append(self.next)
                     yielded = self.comp.send(self.next)
                 case _:
                     yielded = self.comp.send(self.next)
@@ -52,10 +155,19 @@ class _InternalComputation:
         except Exception as e:
             yielded = _FinalValue(e)
 
+        pend = self._pend
         match yielded:
             case Promise():
-                with contextlib.suppress(ValueError):
-                    self._pend.remove(yielded)
+                if pend and yielded in pend:
+                    pend.remove(yielded)
+                return yielded
+            case Timeout():
+                if pend and yielded.promise in pend:
+                    pend.remove(yielded.promise)
+                return yielded
+            case All() | AnyOf() | Race():
+                if pend:
+                    _unpend(pend, yielded)
                 return yielded
             case _FinalValue():
                 self._final = yielded
@@ -66,120 +178,687 @@ class _InternalComputation:
                 return yielded
 
 
+def _unpend(pend: list[Promise], comp: Combinator) -> None:
+    for item in comp.items:
+        if isinstance(item, All | AnyOf | Race):
+            _unpend(pend, item)
+        elif item in pend:
+            pend.remove(item)
+
+
+class _InternalGroup(_InternalComputation):
+    __slots__ = ("children", "remaining", "results")
+
+    def __init__(self, comp: Combinator) -> None:
+        super().__init__(comp)  # pyright: ignore[reportArgumentType]
+        self.children: list[_InternalComputation] = []
+        self.results: list[Any] = [None] * len(comp.items)
+        self.remaining = len(comp.items)
+
+
+type _Runnable = _InternalComputation | tuple[_InternalComputation, Future]
+
+
+def _priority(item: _Runnable) -> int:
+    return item.priority if isinstance(item, _InternalComputation) else item[0].priority
+
+
+class _RunQueue:
+    """Runnable computations by priority, the highest priority with any is popped first.
+
+    Within a priority it is a deque that is popped from the right, items added on the
+    left run after everything already queued and items appended on the right run next.
+    """
+
+    __slots__ = ("_levels", "_queues")
+
+    def __init__(self) -> None:
+        self._queues: dict[int, deque[_Runnable]] = {}
+        self._levels: list[deque[_Runnable]] = []
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._levels)
+
+    def __bool__(self) -> bool:
+        return any(self._levels)
+
+    def append(self, item: _Runnable) -> None:
+        self._queue(_priority(item)).append(item)
+
+    def appendleft(self, item: _Runnable) -> None:
+        self._queue(_priority(item)).appendleft(item)
+
+    def extendleft(self, items: Iterable[_Runnable]) -> None:
+        for item in items:
+            self.appendleft(item)
+
+    def pop(self) -> _Runnable:
+        for q in self._levels:
+            if q:
+                return q.pop()
+        raise IndexError
+
+    def _queue(self, priority: int) -> deque[_Runnable]:
+        if (q := self._queues.get(priority)) is None:
+            q = self._queues[priority] = deque()
+            self._levels = [self._queues[p] for p in sorted(self._queues, reverse=True)]
+        return q
+
+
 class Scheduler:
-    def __init__(self, aio: AIO, size: int = 100) -> None:
-        self._aio = aio
-        self._in = queue.Queue[tuple[_InternalComputation, Future]](size)
+    def __init__(
+        self,
+        aio: AIO,
+        size: int = 100,
+        notify: Callable[[], None] | None = None,
+        metrics: Metrics | None = None,
+        tracer: Tracer | None = None,
+        *,
+        inline: int = 128,
+        journal: Journal | None = None,
+    ) -> None:
+        assert inline >= 0, "inline must not be negative"
 
-        self._running = deque[_InternalComputation | tuple[_InternalComputation, Future]]()
+        self._aio = aio
+        self._tracer = tracer
+        self._journal = journal
+        self._inline = inline
+        self._notify = notify
+        # new computations wait ordered by priority, then by arrival
+        self._in = queue.PriorityQueue[tuple[int, int, _InternalComputation, Future]](size)
+
+        self._running = _RunQueue()
         self._awaiting: dict[_InternalComputation, _InternalComputation] = {}
+        self._ready: list[_InternalComputation] = []
 
         self._p_to_comp: dict[Promise, _InternalComputation] = {}
         self._comp_to_f: dict[_InternalComputation, Future] = {}
 
-    def add[I: Kind | Callable[[], Any], O: Kind | Any](self, comp: Computation[I, O]) -> Future[O]:
-        f = Future[O]()
-        self._in.put_nowait((_InternalComputation(comp), f))
+        # per computation timeouts are kept as (deadline, seq, comp, None) and per yield
+        # timeouts as (deadline, seq, comp, child), stale entries are skipped when popped.
+        self._timeouts: list[
+            tuple[int, int, _InternalComputation, _InternalComputation | None]
+        ] = []
+        self._seq = itertools.count()
+        self._cancelled = deque[_InternalComputation]()
+
+        # schedulers this one may take not yet started computations from when it runs dry
+        self._peers: list[Scheduler] = []
+
+        # callbacks are bound once and partially applied per computation, which is cheaper
+        # than a closure for every submission
+        self._resolve_cb = self._resolve
+        self._on_done_cb = self._on_done
+
+        self._metrics = metrics if metrics is not None else Metrics()
+        self._metrics.gauge("pio_scheduler_queued", self._in.qsize)
+        self._metrics.gauge("pio_scheduler_inflight", lambda: len(self._comp_to_f))
+        self._metrics.gauge("pio_scheduler_awaiting", lambda: len(self._awaiting))
+        self._started = self._metrics.counter("pio_scheduler_started_total")
+        self._stolen = self._metrics.counter("pio_scheduler_stolen_total")
+        self._succeeded = self._metrics.counter("pio_scheduler_completed_total", outcome="ok")
+        self._failed = self._metrics.counter("pio_scheduler_completed_total", outcome="error")
+        self._steps = self._metrics.histogram("pio_scheduler_tick_steps")
+
+    def add[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comp: Computation[I, O],
+        timeout: int | None = None,
+        *,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> Future[O]:
+        """Queue a computation, higher priorities are started and stepped first.
+
+        The priority carries over to everything the computation spawns, including its
+        submissions, which subsystems hand to their workers in the same order.
+
+        When the queue is full, raises queue.Full unless block is set, then waits up to
+        block_timeout seconds for room before raising.
+        """
+        f, entry = self._admission(comp, timeout, priority)
+        self._put(entry, block=block, block_timeout=block_timeout)
+        self._queued()
         return f
 
+    def add_many[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comps: Iterable[Computation[I, O]],
+        timeout: int | None = None,
+        *,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> list[Future[O]]:
+        """Queue several computations at once, waking the loop only once.
+
+        If one of them can't be queued, the ones before it are cancelled.
+        """
+        futures: list[Future[O]] = []
+        try:
+            for comp in comps:
+                f, entry = self._admission(comp, timeout, priority)
+                self._put(entry, block=block, block_timeout=block_timeout)
+                futures.append(f)
+        except queue.Full:
+            for f in futures:
+                f.cancel()
+            raise
+        finally:
+            if futures:
+                self._queued()
+        return futures
+
+    def add_durable(
+        self,
+        name: str,
+        *args: Any,
+        timeout: int | None = None,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> Future[Any]:
+        """Queue the computation the journal's factory name builds from args.
+
+        Its progress is journaled, so a later run recovers it if this one doesn't
+        finish it.
+        """
+        assert self._journal is not None, "durable computations need a journal"
+        comp = self._journal.factory(name)(*args)
+        f, entry = self._admission(comp, timeout, priority)
+        i = self._journal.begin(name, args)
+        entry[2].key = (i,)
+        try:
+            self._put(entry, block=block, block_timeout=block_timeout)
+        except queue.Full:
+            self._journal.end(i)
+            raise
+        self._queued()
+        return f
+
+    def recover(self) -> list[Future[Any]]:
+        """Queue again the durable computations a previous run left unfinished.
+
+        Waits for room in the queue, so with more of them than fit it must be called
+        while the loop runs.
+        """
+        assert self._journal is not None, "recovering needs a journal"
+        futures: list[Future[Any]] = []
+        for i, name, args in self._journal.recover():
+            f, entry = self._admission(self._journal.factory(name)(*args), None, 0)
+            entry[2].key = (i,)
+            self._put(entry, block=True, block_timeout=None)
+            futures.append(f)
+        self._queued()
+        return futures
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    def wake(self) -> None:
+        if self._notify is not None:
+            self._notify()
+
+    def attach_peer(self, peer: Scheduler) -> None:
+        assert peer is not self, "scheduler can't be its own peer"
+        self._peers.append(peer)
+
+    def steal(self) -> list[tuple[_InternalComputation, Future]]:
+        stolen: list[tuple[_InternalComputation, Future]] = []
+        for _ in range(self._in.qsize() // 2):
+            try:
+                _, _, comp, f = self._in.get_nowait()
+            except queue.Empty:
+                break
+            stolen.append((comp, f))
+            self._in.task_done()
+        return stolen
+
     def shutdown(self) -> None:
         self._aio.shutdown()
         self._in.shutdown()
         self._in.join()
         assert len(self._running) == 0
         assert len(self._awaiting) == 0
+        assert len(self._ready) == 0
         assert len(self._p_to_comp) == 0
         assert len(self._comp_to_f) == 0
 
     def run_until_blocked(self, time: int) -> None:
         assert len(self._running) == 0
 
+        self._expire(time)
+
         qsize = self._in.qsize()
         for _ in range(qsize):
             try:
-                e = self._in.get_nowait()
+                _, _, comp, f = self._in.get_nowait()
             except queue.Empty:
                 return
-            self._running.appendleft(e)
+            self._running.appendleft((comp, f))
             self._in.task_done()
 
+        if qsize == 0:
+            for peer in self._peers:
+                if stolen := peer.steal():
+                    self._running.extendleft(stolen)
+                    self._stolen.inc(len(stolen))
+                    break
+
         self.tick(time)
         assert len(self._running) == 0
 
     def tick(self, time: int) -> None:
-        for blocking in list(self._awaiting):
-            if blocking.final is None:
-                continue
+        steps = 0
+        self._unblock()
+        while self._running:
+            while self.step(time):
+                steps += 1
 
-            blocked = self._awaiting.pop(blocking)
-            blocked.next = blocking.final.v
-            self._running.appendleft(blocked)
-
-        while self.step(time):
-            continue
+            # children that completed while stepping may have unblocked their parents
+            self._unblock()
+        if steps:
+            self._steps.record(steps)
 
     def step(self, time: int) -> bool:
         try:
-            match item := self._running.pop():
-                case _InternalComputation():
-                    comp = item
-                case (_InternalComputation(), Future()):
-                    comp, future = item
-                    assert comp.next is None
-                    self._comp_to_f[comp] = future
-                case _:
-                    assert_never(item)
-
+            item = self._running.pop()
         except IndexError:
             return False
 
-        assert comp.final is None
-        yielded = comp.send()
+        if (comp := self._start(item, time)) is None or comp.final is not None:
+            # cancelled before it started, or torn down while it was queued to run
+            return True
+
+        # computations that can go on right away are resumed in place, up to the inline
+        # budget, instead of taking a round trip through the running queue. generator
+        # children run first and their parents are kept on top of the queue meanwhile.
+        budget = self._inline
+        inlined = 0
+        while True:
+            if self._tracer is None:
+                yielded = comp.send()
+            else:
+                start, cpu = perf_counter_ns(), thread_time_ns()
+                yielded = comp.send()
+                self._tracer.step(comp, comp.comp, start, thread_time_ns() - cpu)
+
+            runnable: _InternalComputation | None = comp
+            match yielded:
+                case Promise():
+                    if not self._await(comp, self._p_to_comp.pop(yielded)):
+                        runnable = None
 
-        match yielded:
-            case Promise():
-                match (child_comp := self._p_to_comp.pop(yielded)).final:
-                    case None:
-                        self._awaiting[child_comp] = comp
-                    case _FinalValue(v=v):
-                        comp.next = v
-                        self._running.appendleft(comp)
-                return True
+                case Timeout():
+                    child_comp = self._p_to_comp.pop(yielded.promise)
+                    if not self._await(comp, child_comp, time + yielded.ms):
+                        runnable = None
 
-            case _FinalValue():
-                self._set(comp, yielded)
-                return True
+                case _FinalValue():
+                    runnable = self._finish(comp, yielded)
 
-            case Generator():
-                child_comp = _InternalComputation(yielded)
-                promise = Promise()
-                self._p_to_comp[promise] = child_comp
-                self._running.appendleft(child_comp)
+                case All() | AnyOf() | Race():
+                    if not self._await(comp, self._group(comp, yielded)):
+                        runnable = None
 
-                comp.next = promise
-                self._running.appendleft(comp)
-                return True
-            case _:
-                child_comp = _InternalComputation(yielded)
-                promise = Promise()
-                self._p_to_comp[promise] = child_comp
-                self._aio.dispatch(
-                    SQE(yielded, lambda r, comp=child_comp: self._set(comp, _FinalValue(r)))
-                )
+                case GeneratorType() if budget > 0:
+                    promise = Promise()
+                    runnable = self._child(comp, yielded, schedule=False)
+                    self._p_to_comp[promise] = runnable
+                    comp.next = promise
+                    self._running.append(comp)
+                    inlined += 1
 
-                comp.next = promise
-                self._running.appendleft(comp)
+                case _:
+                    promise = Promise()
+                    self._p_to_comp[promise] = self._child(comp, yielded)
+                    comp.next = promise
+
+            if runnable is None:
+                # blocked or done, go back to the parent it was inlined from
+                if inlined == 0 or budget == 0:
+                    return True
+                parent = self._running.pop()
+                assert isinstance(parent, _InternalComputation)
+                runnable = parent
+                inlined -= 1
+            elif budget == 0:
+                self._running.appendleft(runnable)
                 return True
 
+            budget -= 1
+            comp = runnable
+
     def size(self) -> int:
         return len(self._running) + len(self._awaiting) + self._in.qsize()
 
+    def next_deadline(self) -> int | None:
+        if self._cancelled:
+            return 0
+        if self._timeouts:
+            return self._timeouts[0][0]
+        return None
+
+    def _start(self, item: _Runnable, time: int) -> _InternalComputation | None:
+        match item:
+            case _InternalComputation():
+                return item
+            case (_InternalComputation(), Future()):
+                comp, future = item
+            case _:
+                assert_never(item)
+
+        assert comp.next is None
+        if future.cancelled():
+            comp.comp.close()
+            if self._tracer is not None:
+                self._tracer.end(comp, failed=True)
+            if self._journal is not None and comp.key is not None:
+                self._journal.end(comp.key[0])
+            return None
+
+        # the future is only bound to this scheduler once the computation starts here,
+        # until then any peer may steal it
+        self._comp_to_f[comp] = future
+        self._started.inc()
+        future.add_done_callback(partial(self._on_done_cb, comp))
+        if comp.timeout is not None:
+            heapq.heappush(self._timeouts, (time + comp.timeout, next(self._seq), comp, None))
+        return comp
+
+    def _await(
+        self,
+        comp: _InternalComputation,
+        child: _InternalComputation,
+        deadline: int | None = None,
+    ) -> bool:
+        """Block comp on child, or hand it child's result if it has one, returning True."""
+        if child.final is not None:
+            comp.next = child.final.v
+            return True
+
+        self._awaiting[child] = comp
+        comp.awaiting = child
+        if deadline is not None:
+            heapq.heappush(self._timeouts, (deadline, next(self._seq), comp, child))
+        return False
+
+    def _finish(
+        self, comp: _InternalComputation, final_value: _FinalValue
+    ) -> _InternalComputation | None:
+        """Set comp's result and return the parent waiting for it, resumable right away."""
+        parent = self._awaiting.pop(comp, None)
+        self._set(comp, final_value)
+        if parent is not None:
+            parent.awaiting = None
+            parent.next = final_value.v
+        return parent
+
+    def _group(self, parent: _InternalComputation, comp: Combinator) -> _InternalGroup:
+        group = _InternalGroup(comp)
+        group.priority = parent.priority
+        self._spawn(parent, group)
+        if self._tracer is not None:
+            self._tracer.begin(group, comp, parent)
+        if group.remaining == 0:
+            group.final = _FinalValue([])
+
+        for i, item in enumerate(comp.items):
+            child_comp = self._child(group, item, i)
+            group.children.append(child_comp)
+            if group.final is not None:
+                # settled by an earlier item, the rest is not needed
+                self._teardown(child_comp)
+        return group
+
+    def _admission[O](
+        self, comp: Computation[Any, O], timeout: int | None, priority: int
+    ) -> tuple[Future[O], tuple[int, int, _InternalComputation, Future]]:
+        assert timeout is None or timeout >= 0, "timeout must not be negative"
+
+        f = Future[O]()
+        internal = _InternalComputation(comp)
+        internal.timeout = timeout
+        internal.priority = priority
+        if self._tracer is not None:
+            self._tracer.begin(internal, comp)
+        return f, (-priority, next(self._seq), internal, f)
+
+    def _put(
+        self,
+        entry: tuple[int, int, _InternalComputation, Future],
+        *,
+        block: bool,
+        block_timeout: float | None,
+    ) -> None:
+        try:
+            try:
+                self._in.put_nowait(entry)
+            except queue.Full:
+                if not block:
+                    raise
+                # the loop makes room as it picks computations up, make sure it runs
+                self.wake()
+                self._in.put(entry, timeout=block_timeout)
+        except queue.Full:
+            if self._tracer is not None:
+                self._tracer.end(entry[2], failed=True)
+            raise
+
+    def _queued(self) -> None:
+        self.wake()
+        if self._in.qsize() > 1:
+            # there is a backlog, give idle peers a chance to steal from it
+            for peer in self._peers:
+                peer.wake()
+
+    def _child(
+        self, parent: _InternalComputation, item: Any, index: int = 0, *, schedule: bool = True
+    ) -> _InternalComputation:
+        # items of a combinator belong to its group, other children only to their parent
+        group = parent if isinstance(parent, _InternalGroup) else None
+        if isinstance(item, Promise | All | AnyOf | Race):
+            # nested combinators run as groups of their own
+            child_comp = (
+                self._p_to_comp.pop(item)
+                if isinstance(item, Promise)
+                else self._group(parent, item)
+            )
+            child_comp.group = group
+            child_comp.index = index
+            if group is not None and child_comp.final is not None:
+                # completed before it joined the group, later items settle through _set
+                self._settle(child_comp)
+            return child_comp
+
+        child_comp = _InternalComputation(item)
+        child_comp.group = group
+        child_comp.index = index
+        child_comp.priority = parent.priority
+        self._spawn(parent, child_comp)
+        match item:
+            case Generator():
+                if self._tracer is not None:
+                    self._tracer.begin(child_comp, item, parent)
+                if schedule:
+                    self._running.appendleft(child_comp)
+            case _:
+                child_comp.sqe = SQE(
+                    item, partial(self._resolve_cb, child_comp), child_comp.priority
+                )
+                if self._tracer is not None:
+                    self._tracer.begin(child_comp, item, parent, child_comp.sqe.cb)
+                if (
+                    self._journal is not None
+                    and child_comp.key is not None
+                    and (replayed := self._journal.replay(child_comp.key)) is not None
+                ):
+                    # completed before a restart, don't run it again
+                    self._set(child_comp, _FinalValue(replayed[0]))
+                else:
+                    self._aio.dispatch(child_comp.sqe)
+        return child_comp
+
+    def _spawn(self, parent: _InternalComputation, child: _InternalComputation) -> None:
+        if parent.key is not None:
+            child.key = (*parent.key, parent.spawned)
+            parent.spawned += 1
+
+    def _settle(self, comp: _InternalComputation) -> None:
+        group = comp.group
+        assert group is not None
+        assert comp.final is not None
+        if group.final is not None:
+            return
+
+        v = comp.final.v
+        match group.comp:
+            case All():
+                if isinstance(v, Exception):
+                    self._set(group, _FinalValue(v))
+                else:
+                    group.results[comp.index] = v
+                    group.remaining -= 1
+                    if group.remaining == 0:
+                        self._set(group, _FinalValue(group.results))
+            case AnyOf():
+                if not isinstance(v, Exception):
+                    self._set(group, _FinalValue(v))
+                else:
+                    group.results[comp.index] = v
+                    group.remaining -= 1
+                    if group.remaining == 0:
+                        self._set(
+                            group,
+                            _FinalValue(ExceptionGroup("all items failed", group.results)),
+                        )
+            case Race():
+                self._set(group, _FinalValue(v))
+            case _:
+                raise AssertionError
+
+        if group.final is not None:
+            for child in group.children:
+                self._teardown(child)
+
     def _set(self, comp: _InternalComputation, final_value: _FinalValue) -> None:
-        assert comp.final is None
+        if comp.final is not None:
+            # completion of a child that was torn down
+            return
+
         comp.final = final_value
+        if self._tracer is not None:
+            self._tracer.end(comp, failed=isinstance(final_value.v, Exception))
+        if self._journal is not None and comp.key is not None and len(comp.key) == 1:
+            self._journal.end(comp.key[0])
+        comp.awaiting = None
+        if comp.group is not None:
+            self._settle(comp)
+        if comp in self._awaiting:
+            self._ready.append(comp)
         if (f := self._comp_to_f.pop(comp, None)) is not None:
-            match comp.final.v:
-                case Exception():
-                    f.set_exception(comp.final.v)
+            # the future may have been cancelled from another thread
+            with contextlib.suppress(InvalidStateError):
+                match comp.final.v:
+                    case Exception():
+                        f.set_exception(comp.final.v)
+                        self._failed.inc()
+                    case _:
+                        f.set_result(comp.final.v)
+                        self._succeeded.inc()
+
+    def _unblock(self) -> None:
+        for blocking in self._ready:
+            assert blocking.final is not None
+            if (blocked := self._awaiting.pop(blocking, None)) is None:
+                continue
+            blocked.awaiting = None
+            blocked.next = blocking.final.v
+            self._running.appendleft(blocked)
+        self._ready.clear()
+
+    def _resolve(self, comp: _InternalComputation, r: Any | Exception) -> None:
+        if self._journal is not None and comp.key is not None and comp.final is None:
+            self._journal.record(comp.key, r)
+        self._set(comp, _FinalValue(r))
+
+    def _on_done(self, comp: _InternalComputation, f: Future) -> None:
+        if f.cancelled():
+            self._cancelled.append(comp)
+            if self._notify is not None:
+                self._notify()
+
+    def _expire(self, time: int) -> None:
+        # a computation is resumed with at most one error per pass
+        interrupted: set[_InternalComputation] = set()
+        while self._cancelled:
+            comp = self._cancelled.popleft()
+            if comp in self._comp_to_f and comp not in interrupted:
+                self._interrupt(comp, CancelledError())
+                interrupted.add(comp)
+
+        deferred: list[tuple[int, int, _InternalComputation, _InternalComputation | None]] = []
+        while self._timeouts and self._timeouts[0][0] <= time:
+            entry = heapq.heappop(self._timeouts)
+            _, _, comp, child = entry
+            if comp.final is not None:
+                continue
+
+            match child:
+                case None if comp in interrupted:
+                    # still due, it expires on the next pass unless the computation ends
+                    deferred.append(entry)
+                case None:
+                    self._interrupt(comp, TimeoutError())
+                    interrupted.add(comp)
+                case _InternalComputation() if comp.awaiting is child:
+                    self._interrupt(comp, TimeoutError(), teardown=False)
+                    interrupted.add(comp)
                 case _:
-                    f.set_result(comp.final.v)
+                    continue
+
+        for entry in deferred:
+            heapq.heappush(self._timeouts, entry)
+
+    def _interrupt(
+        self, comp: _InternalComputation, e: Exception, *, teardown: bool = True
+    ) -> None:
+        if (child := comp.awaiting) is not None:
+            del self._awaiting[child]
+            comp.awaiting = None
+            self._teardown(child)
+
+        if teardown:
+            self._teardown_pending(comp)
+
+        comp.next = e
+        self._running.appendleft(comp)
+
+    def _teardown(self, comp: _InternalComputation) -> None:
+        if comp.final is not None:
+            return
+        comp.final = _FinalValue(CancelledError())
+        if self._tracer is not None:
+            self._tracer.end(comp, failed=True)
+
+        if (child := comp.awaiting) is not None:
+            del self._awaiting[child]
+            comp.awaiting = None
+            self._teardown(child)
+        self._teardown_pending(comp)
+
+        match comp:
+            case _InternalGroup():
+                for child in comp.children:
+                    self._teardown(child)
+            case _ if comp.sqe is not None:
+                self._aio.cancel(comp.sqe)
+            case _:
+                with contextlib.suppress(Exception):
+                    comp.comp.close()
+
+    def _teardown_pending(self, comp: _InternalComputation) -> None:
+        for promise in comp.drop_pending():
+            self._teardown(self._p_to_comp.pop(promise))
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import contextlib
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import TYPE_CHECKING, Any
+
+from pio import Pio
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Hashable
+    from multiprocessing.context import BaseContext
+    from multiprocessing.process import BaseProcess
+    from multiprocessing.queues import Queue
+
+    from pio.scheduler import Computation
+    from pio.typing import AIO, Kind
+
+
+def _shards(shards: int | None) -> int:
+    n = shards if shards is not None else os.process_cpu_count() or 1
+    assert n > 0, "shards must be positive"
+    return n
+
+
+class ShardedPio:
+    """Runs a Pio per shard, each with its own scheduler loop thread and AIO.
+
+    Computations are spread across shards by key hash, or round-robin when no key is
+    given, and stay on the shard that starts them. With steal enabled, a shard that runs
+    out of new computations takes half of the not yet started backlog of a peer.
+    """
+
+    def __init__(
+        self,
+        aio_factory: Callable[[], AIO],
+        shards: int | None = None,
+        size: int = 100,
+        dequeue_size: int = 100,
+        tick_freq: float = 0.1,
+        *,
+        wakeup: bool = False,
+        steal: bool = True,
+    ) -> None:
+        self._shards = [
+            Pio(aio_factory(), size, dequeue_size, tick_freq, wakeup=wakeup)
+            for _ in range(_shards(shards))
+        ]
+        if steal:
+            for shard in self._shards:
+                for peer in self._shards:
+                    if peer is not shard:
+                        shard.scheduler.attach_peer(peer.scheduler)
+
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+
+    @property
+    def shards(self) -> list[Pio]:
+        return self._shards
+
+    def add[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comp: Computation[I, O],
+        timeout: int | None = None,
+        key: Hashable | None = None,
+        *,
+        priority: int = 0,
+        block: bool = False,
+        block_timeout: float | None = None,
+    ) -> Future[O]:
+        return self._shard(key).add(
+            comp, timeout, priority=priority, block=block, block_timeout=block_timeout
+        )
+
+    async def add_async[I: Kind | Callable[[], Any] | Coroutine[Any, Any, Any], O: Kind | Any](
+        self,
+        comp: Computation[I, O],
+        timeout: int | None = None,  # noqa: ASYNC109
+        key: Hashable | None = None,
+        *,
+        priority: int = 0,
+        block_timeout: float | None = None,
+    ) -> O:
+        return await self._shard(key).add_async(
+            comp, timeout, priority=priority, block_timeout=block_timeout
+        )
+
+    def start(self) -> None:
+        for shard in self._shards:
+            shard.start()
+
+    def shutdown(self) -> None:
+        for shard in self._shards:
+            shard.shutdown()
+
+    def _shard(self, key: Hashable | None) -> Pio:
+        if key is None:
+            with self._lock:
+                i = next(self._next)
+        else:
+            i = hash(key)
+        return self._shards[i % len(self._shards)]
+
+
+def _dumps(v: Any) -> bytes:
+    try:
+        return pickle.dumps(v)
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        msg = (
+            f"{v!r} can't be pickled to cross to a shard process, "
+            "use module level functions or functools.partial of them"
+        )
+        raise TypeError(msg) from e
+
+
+def _outcome(f: Future[Any]) -> bytes:
+    try:
+        return _dumps((True, f.result()))
+    except Exception as e:
+        try:
+            return _dumps((False, e))
+        except TypeError:
+            return _dumps((False, RuntimeError(repr(e))))
+
+
+def _serve(
+    aio_factory: Callable[[], AIO],
+    inbox: Queue[tuple[int, bytes] | None],
+    outbox: Queue[tuple[int, bytes | None]],
+    *,
+    shard: int,
+    size: int,
+    dequeue_size: int,
+    tick_freq: float,
+) -> None:
+    pio = Pio(aio_factory(), size, dequeue_size, tick_freq, wakeup=True)
+    pio.start()
+
+    while (msg := inbox.get()) is not None:
+        i, payload = msg
+        try:
+            factory, timeout, priority, block_timeout = pickle.loads(payload)  # noqa: S301
+            # waiting for room stops reading the inbox, which holds back the next adds
+            f = pio.add(
+                factory(), timeout, priority=priority, block=True, block_timeout=block_timeout
+            )
+        except Exception as e:
+            outbox.put((i, _dumps((False, e))))
+        else:
+            f.add_done_callback(lambda f, i=i: outbox.put((i, _outcome(f))))
+
+    pio.shutdown()
+    outbox.put((shard, None))
+
+
+class ProcessShardedPio:
+    """Runs a Pio per shard in its own process, for parallelism beyond one interpreter.
+
+    Generators can't cross process boundaries, so add takes a picklable factory that
+    builds the computation inside the shard process. Results travel back pickled.
+    Unlike ShardedPio, shards don't steal from each other. When a shard process dies,
+    its outstanding futures and later adds to it fail with RuntimeError.
+    """
+
+    def __init__(
+        self,
+        aio_factory: Callable[[], AIO],
+        shards: int | None = None,
+        size: int = 100,
+        dequeue_size: int = 100,
+        tick_freq: float = 0.1,
+        *,
+        mp_context: BaseContext | None = None,
+    ) -> None:
+        self._aio_factory = aio_factory
+        self._n = _shards(shards)
+        self._size = size
+        self._dequeue_size = dequeue_size
+        self._tick_freq = tick_freq
+        self._ctx = mp_context or multiprocessing.get_context()
+
+        # results come back on the outbox as (id, payload), a shard that is done as
+        # (shard, None), sent by the shard itself and by the watcher once it exits
+        self._inboxes: list[Queue[tuple[int, bytes] | None]] = []
+        self._outbox: Queue[tuple[int, bytes | None]] | None = None
+        self._processes: list[BaseProcess] = []
+        self._collector: threading.Thread | None = None
+        self._watcher: threading.Thread | None = None
+
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._futures: dict[int, tuple[int, Future[Any]]] = {}
+        self._dead: dict[int, RuntimeError] = {}
+
+    def add[O](
+        self,
+        factory: Callable[[], Computation[Any, O]],
+        timeout: int | None = None,
+        key: Hashable | None = None,
+        *,
+        priority: int = 0,
+        block_timeout: float | None = None,
+    ) -> Future[O]:
+        """Queue the computation factory builds on a shard.
+
+        The shard waits up to block_timeout seconds for room in its queue, if there is
+        none by then the future fails with queue.Full.
+        """
+        assert self._collector is not None, "shards must be started"
+        payload = _dumps((factory, timeout, priority, block_timeout))
+
+        f = Future[O]()
+        with self._lock:
+            i = next(self._next)
+            shard = (i if key is None else hash(key)) % self._n
+            if (e := self._dead.get(shard)) is not None:
+                f.set_exception(e)
+                return f
+            self._futures[i] = (shard, f)
+
+        self._inboxes[shard].put((i, payload))
+        return f
+
+    def start(self) -> None:
+        if self._collector is not None:
+            return
+
+        self._outbox = self._ctx.Queue()
+        for shard in range(self._n):
+            inbox = self._ctx.Queue()
+            process = self._ctx.Process(  # pyright: ignore[reportAttributeAccessIssue]
+                target=_serve,
+                args=(self._aio_factory, inbox, self._outbox),
+                kwargs={
+                    "shard": shard,
+                    "size": self._size,
+                    "dequeue_size": self._dequeue_size,
+                    "tick_freq": self._tick_freq,
+                },
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def shutdown(self) -> None:
+        if self._collector is None:
+            return
+
+        assert self._watcher is not None
+        for shard, inbox in enumerate(self._inboxes):
+            with self._lock:
+                if shard in self._dead:
+                    continue
+            inbox.put(None)
+        self._collector.join()
+        self._watcher.join()
+        for process in self._processes:
+            process.join()
+
+        self._inboxes.clear()
+        self._processes.clear()
+        self._outbox = None
+        self._collector = None
+        self._watcher = None
+        self._dead.clear()
+
+    def _watch(self) -> None:
+        # tells the collector about every shard process that exits, it tells apart the
+        # ones that finished from the ones that died
+        assert self._outbox is not None
+        running = {process.sentinel: shard for shard, process in enumerate(self._processes)}
+        while running:
+            for sentinel in multiprocessing.connection.wait(list(running)):
+                assert isinstance(sentinel, int)
+                self._outbox.put((running.pop(sentinel), None))
+
+    def _collect(self) -> None:
+        assert self._outbox is not None
+        done: set[int] = set()
+        while len(done) < self._n:
+            i, payload = self._outbox.get()
+            if payload is None:
+                if i not in done:
+                    # a shard that finishes resolves everything it was given before it
+                    # says so, whatever is left belongs to one that died
+                    done.add(i)
+                    self._fail(i)
+                continue
+
+            with self._lock:
+                if (entry := self._futures.pop(i, None)) is None:
+                    continue
+            f = entry[1]
+
+            ok, v = pickle.loads(payload)  # noqa: S301
+            with contextlib.suppress(InvalidStateError):
+                if ok:
+                    f.set_result(v)
+                else:
+                    f.set_exception(v)
+
+    def _fail(self, shard: int) -> None:
+        exitcode = self._processes[shard].exitcode
+        e = RuntimeError(f"shard {shard} exited with {exitcode}")
+        with self._lock:
+            self._dead[shard] = e
+            lost = [i for i, (owner, _) in self._futures.items() if owner == shard]
+            futures = [self._futures.pop(i)[1] for i in lost]
+        for f in futures:
+            with contextlib.suppress(InvalidStateError):
+                f.set_exception(e)
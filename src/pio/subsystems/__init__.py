@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import math
+import queue
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    from pio.bus import SQE
+
+
+# weight of the latest batch in the moving average of the service time
+_ALPHA = 0.2
+
+
+def discard[T](q: queue.Queue[T], item: T) -> bool:
+    """Remove a not yet consumed item from a queue, keeping its task accounting intact."""
+    with q.mutex:
+        try:
+            q.queue.remove(item)
+        except ValueError:
+            return False
+
+        q.unfinished_tasks -= 1
+        if q.unfinished_tasks == 0:
+            q.all_tasks_done.notify_all()
+        q.not_full.notify()
+        return True
+
+
+class _Levels:
+    """FIFO per priority, handing out the oldest submission of the highest priority."""
+
+    __slots__ = ("_levels", "_queues")
+
+    def __init__(self) -> None:
+        self._queues: dict[int, deque[SQE]] = {}
+        self._levels: list[deque[SQE]] = []
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._levels)
+
+    def append(self, sqe: SQE) -> None:
+        if (q := self._queues.get(sqe.priority)) is None:
+            q = self._queues[sqe.priority] = deque()
+            self._levels = [self._queues[p] for p in sorted(self._queues, reverse=True)]
+        q.append(sqe)
+
+    def popleft(self) -> SQE:
+        for q in self._levels:
+            if q:
+                return q.popleft()
+        raise IndexError
+
+    def remove(self, sqe: SQE) -> None:
+        if (q := self._queues.get(sqe.priority)) is None:
+            raise ValueError
+        q.remove(sqe)
+
+
+class SubmissionQueue[T: SQE](queue.Queue[T]):
+    """Bounded submission queue that hands higher priority submissions to workers first."""
+
+    def _init(self, maxsize: int) -> None:
+        self.queue = _Levels()
+
+    def _qsize(self) -> int:
+        return len(self.queue)
+
+    def _put(self, item: T) -> None:
+        self.queue.append(item)
+
+    def _get(self) -> T:
+        return self.queue.popleft()  # pyright: ignore[reportReturnType]
+
+
+class Workers:
+    """The worker loops of a subsystem on the shared pool, between lo and hi of them.
+
+    When hi is above lo the count adapts to the load. Every flush estimates from the
+    arrival rate and the measured service time how many workers are kept busy and adds
+    one more while the queue backs up, workers that stay idle for idle ms retire until
+    lo are left.
+    """
+
+    def __init__(
+        self,
+        pool: ThreadPoolExecutor | None,
+        lo: int = 1,
+        hi: int | None = None,
+        *,
+        idle: int = 1_000,
+    ) -> None:
+        hi = lo if hi is None else hi
+        assert lo > 0, "workers must be positive"
+        assert hi >= lo, "max workers must be at least workers"
+        assert idle > 0, "idle must be positive"
+
+        self._pool = pool
+        self.lo = lo
+        self.hi = hi
+        self._idle = idle / 1_000
+
+        self._lock = threading.Lock()
+        self._worker: Callable[[], None] | None = None
+        self._futures: list[Future[None]] = []
+        self._n = 0
+
+        # arrivals are counted on the loop thread, the service time per submission in
+        # ms is a moving average updated by the workers
+        self._arrived = 0
+        self._last: int | None = None
+        self._service = 0.0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def started(self) -> bool:
+        return len(self._futures) > 0
+
+    def start(self, worker: Callable[[], None]) -> None:
+        assert self._pool is not None
+        if self._futures:
+            return
+
+        self._worker = worker
+        with self._lock:
+            for _ in range(self.lo):
+                self._spawn()
+
+    def join(self) -> None:
+        """Wait for every worker to exit, the queue they take from must be shut down."""
+        for f in self._futures:
+            assert f.result() is None
+        self._futures.clear()
+
+    def get[T](self, q: queue.Queue[T]) -> T | None:
+        """Next item for a worker, None once it should exit."""
+        timeout = self._idle if self.hi > self.lo else None
+        while True:
+            try:
+                return q.get(timeout=timeout)
+            except queue.ShutDown:
+                break
+            except queue.Empty:
+                with self._lock:
+                    if self._n > self.lo:
+                        self._n -= 1
+                        return None
+
+        with self._lock:
+            self._n -= 1
+        return None
+
+    def arrived(self) -> None:
+        self._arrived += 1
+
+    def served(self, n: int, ns: int) -> None:
+        self._service += (ns / n / 1_000_000 - self._service) * _ALPHA
+
+    def scale(self, time: int, depth: int, batch_size: int = 1) -> None:
+        if self.hi == self.lo or not self._futures:
+            return
+        if self._last is None:
+            self._last = time
+            return
+        if time <= self._last:
+            return
+
+        rate = self._arrived / (time - self._last)
+        self._arrived, self._last = 0, time
+        want = math.ceil(rate * self._service)
+        with self._lock:
+            if depth > self._n * batch_size:
+                want = max(want, self._n + 1)
+            for _ in range(min(want, self.hi) - self._n):
+                self._spawn()
+
+    def _spawn(self) -> None:
+        assert self._pool is not None
+        assert self._worker is not None
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(self._pool.submit(self._worker))
+        self._n += 1
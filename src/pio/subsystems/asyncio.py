@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any
+
+from pio.bus import CQE, SQE
+
+if TYPE_CHECKING:
+    from collections.abc import Coroutine
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    from pio.typing import AIO
+
+
+_KIND = "asyncio"
+
+
+class AsyncioSubsystem:
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+    ) -> None:
+        assert size > 0, "size must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._size = size
+        self._future: Future[None] | None = None
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._closing = False
+
+        # submissions enqueued before start wait here for the loop
+        self._queued: list[SQE[Coroutine[Any, Any, Any], Any]] = []
+        self._tasks: dict[SQE, asyncio.Task[None]] = {}
+        self._done: list[tuple[CQE, str]] = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def depth(self) -> int:
+        return self._inflight
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    def start(self) -> None:
+        assert self._pool is not None
+        if self._future is None:
+            loop = asyncio.new_event_loop()
+            with self._lock:
+                self._loop = loop
+                queued, self._queued = self._queued, []
+            for sqe in queued:
+                loop.call_soon(self._spawn, sqe)
+            self._closing = False
+            self._future = self._pool.submit(self.worker)
+
+    def shutdown(self) -> None:
+        if self._future is not None:
+            assert self._loop is not None
+            self._loop.call_soon_threadsafe(self._close)
+            assert self._future.result() is None
+
+            self._loop.close()
+            self._loop = None
+            self._future = None
+
+    def enqueue(self, sqe: SQE[Coroutine[Any, Any, Any], Any]) -> bool:
+        with self._lock:
+            if self._inflight >= self._size:
+                return False
+            self._inflight += 1
+            if (loop := self._loop) is None:
+                self._queued.append(sqe)
+                return True
+
+        loop.call_soon_threadsafe(self._spawn, sqe)
+        return True
+
+    def cancel(self, sqe: SQE[Coroutine[Any, Any, Any], Any]) -> None:
+        with self._lock:
+            if (loop := self._loop) is None:
+                if sqe in self._queued:
+                    self._queued.remove(sqe)
+                    self._inflight -= 1
+                    sqe.v.close()
+                return
+
+        loop.call_soon_threadsafe(self._cancel, sqe)
+
+    def flush(self, time: int) -> None:
+        return
+
+    def next_deadline(self) -> int | None:
+        return None
+
+    def process(self, sqes: list[SQE[Coroutine[Any, Any, Any], Any]]) -> list[CQE]:
+        async def gather() -> list[Any]:
+            return await asyncio.gather(*(sqe.v for sqe in sqes), return_exceptions=True)
+
+        return [CQE(v, sqe.cb) for sqe, v in zip(sqes, asyncio.run(gather()), strict=True)]
+
+    def worker(self) -> None:
+        assert self._loop is not None
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            asyncio.set_event_loop(None)
+
+    def _spawn(self, sqe: SQE[Coroutine[Any, Any, Any], Any]) -> None:
+        assert self._loop is not None
+        task = self._loop.create_task(self._run(sqe))
+        self._tasks[sqe] = task
+        task.add_done_callback(lambda task, sqe=sqe: self._finish(sqe, task))
+
+    def _finish(self, sqe: SQE[Coroutine[Any, Any, Any], Any], task: asyncio.Task[None]) -> None:
+        del self._tasks[sqe]
+        if task.cancelled():
+            # nobody is waiting for the completion anymore, the coroutine may not even have
+            # started if the task was cancelled right away
+            sqe.v.close()
+            with self._lock:
+                self._inflight -= 1
+            if self._closing:
+                self._close()
+
+    def _cancel(self, sqe: SQE[Coroutine[Any, Any, Any], Any]) -> None:
+        if (task := self._tasks.get(sqe)) is not None:
+            task.cancel()
+
+    async def _run(self, sqe: SQE[Coroutine[Any, Any, Any], Any]) -> None:
+        self._aio.started([sqe])
+        try:
+            v = await sqe.v
+        except Exception as e:
+            v = e
+
+        # completions that finish in the same loop iteration are published together
+        if not self._done:
+            asyncio.get_running_loop().call_soon(self._publish)
+        self._done.append((CQE(v, sqe.cb), self.kind))
+
+    def _publish(self) -> None:
+        done, self._done = self._done, []
+        self._aio.enqueue_many(done)
+        with self._lock:
+            self._inflight -= len(done)
+
+        if self._closing:
+            self._close()
+
+    def _close(self) -> None:
+        assert self._loop is not None
+        self._closing = True
+        with self._lock:
+            if self._inflight == 0:
+                self._loop.stop()
@@ -3,12 +3,14 @@ from __future__ import annotations
 import queue
 from collections.abc import Callable
 from dataclasses import dataclass
+from time import perf_counter_ns
 from typing import TYPE_CHECKING
 
 from pio.bus import CQE, SQE
+from pio.subsystems import SubmissionQueue, Workers, discard
 
 if TYPE_CHECKING:
-    from concurrent.futures import Future, ThreadPoolExecutor
+    from concurrent.futures import ThreadPoolExecutor
 
     from pio.typing import AIO
 
@@ -41,38 +43,43 @@ class EchoSubsystem:
         pool: ThreadPoolExecutor | None = None,
         size: int = 100,
         workers: int = 1,
+        batch_size: int = 1,
+        *,
+        max_workers: int | None = None,
+        idle: int = 1_000,
     ) -> None:
         assert size > 0, "size must be positive"
-        assert workers > 0, "workers must be positive"
+        assert batch_size > 0, "batch size must be positive"
 
         self._aio = aio
         self._pool = pool
-        self._sq = queue.Queue[SQE[EchoSubmission, EchoCompletion]](size)
-        self._workers = workers
-        self._futures: list[Future[None]] = []
+        self._sq = SubmissionQueue[SQE[EchoSubmission, EchoCompletion]](size)
+        self._workers = Workers(pool, workers, max_workers, idle=idle)
+        self._batch_size = batch_size
 
     @property
     def size(self) -> int:
         return self._sq.maxsize
 
+    @property
+    def depth(self) -> int:
+        return self._sq.qsize()
+
     @property
     def kind(self) -> str:
         return _KIND
 
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
     def start(self) -> None:
-        assert self._pool is not None
-        if len(self._futures) == 0:
-            for _ in range(self._workers):
-                self._futures.append(self._pool.submit(self.worker))
+        self._workers.start(self.worker)
 
     def shutdown(self) -> None:
-        if len(self._futures) > 0:
-            assert len(self._futures) == self._workers
+        if self._workers.started:
             self._sq.shutdown()
-            for f in self._futures:
-                assert f.result() is None
-
-            self._futures.clear()
+            self._workers.join()
             self._sq.join()
 
     def enqueue(self, sqe: SQE[EchoSubmission, EchoCompletion]) -> bool:
@@ -81,30 +88,38 @@ class EchoSubsystem:
             self._sq.put_nowait(sqe)
         except queue.Full:
             return False
+        self._workers.arrived()
         return True
 
-    def flush(self, time: int) -> None:
-        return
+    def cancel(self, sqe: SQE) -> None:
+        discard(self._sq, sqe)
 
-    def process(self, sqes: list[SQE[EchoSubmission, EchoCompletion]]) -> list[CQE[EchoCompletion]]:
-        sqe = sqes[0]
-        assert not isinstance(sqe.v, Callable)
+    def flush(self, time: int) -> None:
+        self._workers.scale(time, self._sq.qsize(), self._batch_size)
 
-        return [
-            CQE(
-                EchoCompletion(sqe.v.data),
-                sqe.cb,
-            ),
-        ]
+    def next_deadline(self) -> int | None:
+        return None
 
-    def worker(self) -> None:
-        while True:
-            try:
-                sqe = self._sq.get()
-            except queue.ShutDown:
-                break
+    def process(self, sqes: list[SQE[EchoSubmission, EchoCompletion]]) -> list[CQE[EchoCompletion]]:
+        cqes: list[CQE[EchoCompletion]] = []
+        for sqe in sqes:
             assert not isinstance(sqe.v, Callable)
-            assert sqe.v.kind == self.kind
+            cqes.append(CQE(EchoCompletion(sqe.v.data), sqe.cb))
+        return cqes
 
-            self._aio.enqueue((self.process([sqe])[0], self.kind))
-            self._sq.task_done()
+    def worker(self) -> None:
+        while (sqe := self._workers.get(self._sq)) is not None:
+            sqes = [sqe]
+            while len(sqes) < self._batch_size:
+                try:
+                    sqes.append(self._sq.get_nowait())
+                except (queue.Empty, queue.ShutDown):
+                    break
+
+            self._aio.started(sqes)
+            start = perf_counter_ns()
+            cqes = self.process(sqes)
+            self._workers.served(len(sqes), perf_counter_ns() - start)
+            self._aio.enqueue_many([(cqe, self.kind) for cqe in cqes])
+            for _ in sqes:
+                self._sq.task_done()
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import mmap
+import operator
+import os
+import queue
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from pio.bus import CQE, SQE
+from pio.subsystems import SubmissionQueue, Workers, discard
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from io import FileIO
+    from pathlib import Path
+
+    from pio.typing import AIO
+
+
+_KIND = "file"
+
+
+@dataclass(frozen=True)
+class ReadFile:
+    path: str | Path
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class ReadRange:
+    path: str | Path
+    offset: int
+    length: int
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class WriteFile:
+    path: str | Path
+    data: bytes
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Append:
+    path: str | Path
+    data: bytes
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+type FileSubmission = ReadFile | ReadRange | WriteFile | Append
+
+
+def _reads(v: FileSubmission) -> bool:
+    return isinstance(v, ReadFile | ReadRange)
+
+
+def _read(f: FileIO, offset: int, length: int) -> bytes:
+    f.seek(offset)
+    chunks: list[bytes] = []
+    while length > 0 and (chunk := f.read(length)):
+        chunks.append(chunk)
+        length -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+
+class FileSubsystem:
+    """Reads and writes local files, completing reads with bytes and writes with ints.
+
+    Runs of reads in a batch open every file once and merge overlapping or adjacent
+    ranges into a single read, served from an mmap of the file when the merged range
+    is at least mmap_threshold bytes and by one read otherwise. Runs of writes fsync
+    every file they touch once, at the end of the run. WriteFile completes with the
+    bytes written, Append with the offset its data landed at, taken from the file
+    position after its write, so writers appending concurrently don't skew it.
+    """
+
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+        workers: int = 1,
+        batch_size: int = 100,
+        *,
+        mmap_threshold: int = 1 << 20,
+        max_workers: int | None = None,
+        idle: int = 1_000,
+    ) -> None:
+        assert size > 0, "size must be positive"
+        assert batch_size > 0, "batch size must be positive"
+        assert mmap_threshold > 0, "mmap threshold must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._sq = SubmissionQueue[SQE[FileSubmission, Any]](size)
+        self._workers = Workers(pool, workers, max_workers, idle=idle)
+        self._batch_size = batch_size
+        self._mmap_threshold = mmap_threshold
+
+    @property
+    def size(self) -> int:
+        return self._sq.maxsize
+
+    @property
+    def depth(self) -> int:
+        return self._sq.qsize()
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def start(self) -> None:
+        self._workers.start(self.worker)
+
+    def shutdown(self) -> None:
+        if self._workers.started:
+            self._sq.shutdown()
+            self._workers.join()
+            self._sq.join()
+
+    def enqueue(self, sqe: SQE[FileSubmission, Any]) -> bool:
+        assert sqe.v.kind == _KIND
+        try:
+            self._sq.put_nowait(sqe)
+        except queue.Full:
+            return False
+        self._workers.arrived()
+        return True
+
+    def cancel(self, sqe: SQE) -> None:
+        discard(self._sq, sqe)
+
+    def flush(self, time: int) -> None:
+        self._workers.scale(time, self._sq.qsize(), self._batch_size)
+
+    def next_deadline(self) -> int | None:
+        return None
+
+    def process(self, sqes: list[SQE[FileSubmission, Any]]) -> list[CQE]:
+        # reads and writes keep their order, consecutive ones of a kind are a run
+        results: list[Any] = [None] * len(sqes)
+        i = 0
+        while i < len(sqes):
+            j = i + 1
+            reads = _reads(sqes[i].v)
+            while j < len(sqes) and _reads(sqes[j].v) == reads:
+                j += 1
+
+            run = [(k, sqes[k].v) for k in range(i, j)]
+            if reads:
+                self._read(run, results)
+            else:
+                self._write(run, results)
+            i = j
+        return [CQE(v, sqe.cb) for v, sqe in zip(results, sqes, strict=True)]
+
+    def worker(self) -> None:
+        while (sqe := self._workers.get(self._sq)) is not None:
+            sqes = [sqe]
+            while len(sqes) < self._batch_size:
+                try:
+                    sqes.append(self._sq.get_nowait())
+                except (queue.Empty, queue.ShutDown):
+                    break
+
+            try:
+                self._aio.started(sqes)
+                start = perf_counter_ns()
+                cqes = self.process(sqes)
+                self._workers.served(len(sqes), perf_counter_ns() - start)
+                self._aio.enqueue_many([(cqe, self.kind) for cqe in cqes])
+            finally:
+                # shutdown joins the queue, it must not wait on a batch that failed
+                for _ in sqes:
+                    self._sq.task_done()
+
+    def _read(self, run: list[tuple[int, FileSubmission]], results: list[Any]) -> None:
+        by_path: dict[str, list[tuple[int, ReadFile | ReadRange]]] = {}
+        for i, v in run:
+            assert isinstance(v, ReadFile | ReadRange)
+            try:
+                by_path.setdefault(os.fspath(v.path), []).append((i, v))
+            except TypeError as e:
+                results[i] = e
+
+        for path, reads in by_path.items():
+            try:
+                with open(path, "rb", buffering=0) as f:  # noqa: PTH123
+                    self._read_ranges(f, reads, results)
+            except Exception as e:
+                # errors of a file fail the reads of it, not the rest of the batch
+                for i, _ in reads:
+                    results[i] = e
+
+    def _read_ranges(
+        self, f: FileIO, reads: list[tuple[int, ReadFile | ReadRange]], results: list[Any]
+    ) -> None:
+        size = os.fstat(f.fileno()).st_size
+        ranges: list[tuple[int, int, int]] = []
+        for i, v in reads:
+            match v:
+                case ReadFile():
+                    ranges.append((0, size, i))
+                case ReadRange(offset=offset, length=length):
+                    try:
+                        start = min(max(operator.index(offset), 0), size)
+                        end = min(start + max(operator.index(length), 0), size)
+                    except TypeError as e:
+                        results[i] = e
+                        continue
+                    ranges.append((start, end, i))
+        ranges.sort()
+
+        # overlapping and adjacent ranges are served by one read of their span
+        spans: list[tuple[int, int, list[tuple[int, int, int]]]] = []
+        for r in ranges:
+            if spans and r[0] <= spans[-1][1]:
+                start, end, members = spans[-1]
+                members.append(r)
+                spans[-1] = (start, max(end, r[1]), members)
+            else:
+                spans.append((r[0], r[1], [r]))
+
+        mapped: mmap.mmap | None = None
+        try:
+            for start, end, members in spans:
+                if end - start >= self._mmap_threshold:
+                    if mapped is None:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    for a, b, i in members:
+                        results[i] = mapped[a:b]
+                    continue
+
+                # members covering the whole span get the read itself, others a slice
+                data = _read(f, start, end - start)
+                for a, b, i in members:
+                    whole = a == start and b - a >= len(data)
+                    results[i] = data if whole else data[a - start : b - start]
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+    def _write(self, run: list[tuple[int, FileSubmission]], results: list[Any]) -> None:
+        # every file written in the run stays open until its single fsync at the end
+        files: dict[str, tuple[BinaryIO, list[int]]] = {}
+        for i, v in run:
+            assert isinstance(v, WriteFile | Append)
+            path = os.fspath(v.path)
+            try:
+                match v:
+                    case WriteFile():
+                        if (opened := files.pop(path, None)) is not None:
+                            self._sync(*opened, results)
+                        f = open(path, "wb")  # noqa: PTH123, SIM115
+                        files[path] = (f, [i])
+                        results[i] = f.write(v.data)
+                    case Append():
+                        if (opened := files.get(path)) is None:
+                            # unbuffered, so the position is read after the data is written
+                            f = open(path, "ab", buffering=0)  # noqa: PTH123, SIM115
+                            opened = files[path] = (f, [])
+                        f, indices = opened
+                        indices.append(i)
+                        view = memoryview(v.data)
+                        n = 0
+                        while n < len(view):
+                            n += f.write(view[n:]) or 0
+                        results[i] = f.tell() - n
+            except Exception as e:
+                results[i] = e
+
+        for f, indices in files.values():
+            self._sync(f, indices, results)
+
+    def _sync(self, f: BinaryIO, indices: list[int], results: list[Any]) -> None:
+        try:
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError as e:
+            for i in indices:
+                results[i] = e
+        finally:
+            f.close()
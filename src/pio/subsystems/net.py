@@ -0,0 +1,485 @@
+from __future__ import annotations
+
+import contextlib
+import errno
+import itertools
+import os
+import selectors
+import socket
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from pio.bus import CQE, SQE
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Sequence
+    from concurrent.futures import ThreadPoolExecutor
+
+    from pio.typing import AIO
+
+
+_KIND = "net"
+
+_SUBMIT = 0
+_CANCEL = 1
+_RESUME = 2
+
+# an operation is a generator that yields the socket and the events it waits for, or a
+# future of work that can't be done on the selector thread
+type _Wait = tuple[socket.socket, int] | Future[Any]
+type _Address = tuple[socket.AddressFamily, socket.SocketKind, int, str, Any]
+type _Op[T] = Generator[_Wait, None, T]
+
+
+@dataclass(frozen=True)
+class Connection:
+    id: int
+    host: str
+    port: int
+
+
+@dataclass(frozen=True)
+class Connect:
+    host: str
+    port: int
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Send:
+    conn: Connection
+    data: bytes
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Recv:
+    conn: Connection
+    size: int = 65_536
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Release:
+    conn: Connection
+    reuse: bool = True
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Request:
+    """Sends data and reads the response until size bytes, the delimiter or EOF.
+
+    Anything the peer sends past size or the delimiter is dropped, with the connection.
+    A request on a pooled connection the peer closed meanwhile is sent again on a new
+    one, so requests should be idempotent.
+    """
+
+    host: str
+    port: int
+    data: bytes
+    size: int | None = None
+    delimiter: bytes | None = None
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+type NetSubmission = Connect | Send | Recv | Release | Request
+
+
+def _connect(info: _Address) -> _Op[socket.socket]:
+    family, kind, proto, _, address = info
+    sock = socket.socket(family, kind, proto)
+    connected = False
+    try:
+        sock.setblocking(False)  # noqa: FBT003
+        if family in {socket.AF_INET, socket.AF_INET6}:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        err = sock.connect_ex(address)
+        if err in {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN}:
+            yield sock, selectors.EVENT_WRITE
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            raise OSError(err, os.strerror(err))
+        connected = True
+    finally:
+        if not connected:
+            sock.close()
+    return sock
+
+
+def _send(sock: socket.socket, data: bytes) -> _Op[None]:
+    view = memoryview(data)
+    while view:
+        try:
+            n = sock.send(view)
+        except BlockingIOError:
+            yield sock, selectors.EVENT_WRITE
+        else:
+            view = view[n:]
+
+
+def _recv(sock: socket.socket, size: int) -> _Op[bytes]:
+    while True:
+        try:
+            return sock.recv(size)
+        except BlockingIOError:
+            yield sock, selectors.EVENT_READ
+
+
+def _end(buf: bytearray, start: int, v: Request) -> int | None:
+    """Where the response ends in buf, searching for the delimiter from start on."""
+    if v.size is not None:
+        return v.size if len(buf) >= v.size else None
+    if v.delimiter is not None and (i := buf.find(v.delimiter, start)) >= 0:
+        return i + len(v.delimiter)
+    return None
+
+
+class NetSubsystem:
+    """Multiplexes the socket operations of every computation on one selector thread.
+
+    Sockets are non-blocking and an operation only holds on to its socket while it
+    waits for it to become ready, so thousands can be in flight on a single worker.
+    Requests take an idle connection to their host from the pool, and put it back
+    when the response ends by size or delimiter. Connections handed out by Connect
+    belong to the computation until it releases them, back to the pool by default.
+    """
+
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+        *,
+        keepalive: int = 8,
+        chunk_size: int = 65_536,
+    ) -> None:
+        assert size > 0, "size must be positive"
+        assert keepalive >= 0, "keepalive must not be negative"
+        assert chunk_size > 0, "chunk size must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._size = size
+        self._keepalive = keepalive
+        self._chunk_size = chunk_size
+        self._future: Future[None] | None = None
+
+        # submissions and cancellations reach the selector thread through the inbox,
+        # a byte on the wakeup socket interrupts its select
+        self._lock = threading.Lock()
+        self._inbox: list[tuple[SQE[NetSubmission, Any], int]] = []
+        self._inflight = 0
+        self._closing = False
+        self._wakeup: tuple[socket.socket, socket.socket] | None = None
+
+        # everything else is only touched by the thread running the selector
+        self._selector = selectors.DefaultSelector()
+        self._ops: dict[SQE[NetSubmission, Any], _Op[Any]] = {}
+        self._waiting: dict[SQE[NetSubmission, Any], socket.socket] = {}
+        self._connections: dict[int, socket.socket] = {}
+        self._ids = itertools.count()
+        self._idle: dict[tuple[str, int], list[socket.socket]] = {}
+        self._done: list[tuple[SQE[NetSubmission, Any], CQE]] = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def depth(self) -> int:
+        return self._inflight
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    def start(self) -> None:
+        assert self._pool is not None
+        if self._future is None:
+            r, w = socket.socketpair()
+            r.setblocking(False)  # noqa: FBT003
+            w.setblocking(False)  # noqa: FBT003
+            self._selector.register(r, selectors.EVENT_READ)
+            self._wakeup = (r, w)
+            self._closing = False
+            self._future = self._pool.submit(self.worker)
+
+    def shutdown(self) -> None:
+        if self._future is not None:
+            assert self._wakeup is not None
+            with self._lock:
+                self._closing = True
+            self._wake()
+            assert self._future.result() is None
+            self._future = None
+
+            r, w = self._wakeup
+            self._selector.unregister(r)
+            r.close()
+            w.close()
+            self._wakeup = None
+
+        for sock in self._connections.values():
+            sock.close()
+        for idle in self._idle.values():
+            for sock in idle:
+                self._selector.unregister(sock)
+                sock.close()
+        self._connections.clear()
+        self._idle.clear()
+
+    def enqueue(self, sqe: SQE[NetSubmission, Any]) -> bool:
+        assert sqe.v.kind == _KIND
+        with self._lock:
+            if self._inflight >= self._size:
+                return False
+            self._inflight += 1
+            self._inbox.append((sqe, _SUBMIT))
+        self._wake()
+        return True
+
+    def cancel(self, sqe: SQE[NetSubmission, Any]) -> None:
+        with self._lock:
+            if (sqe, _SUBMIT) in self._inbox:
+                self._inbox.remove((sqe, _SUBMIT))
+                self._inflight -= 1
+                return
+            self._inbox.append((sqe, _CANCEL))
+        self._wake()
+
+    def flush(self, time: int) -> None:
+        return
+
+    def next_deadline(self) -> int | None:
+        return None
+
+    def process(self, sqes: list[SQE[NetSubmission, Any]]) -> list[CQE]:
+        for sqe in sqes:
+            self._begin(sqe)
+        while self._ops:
+            self._poll(None)
+
+        # completions come in as they finish, they are handed back in submission order
+        done: dict[SQE[NetSubmission, Any], list[CQE]] = {}
+        for sqe, cqe in self._done:
+            done.setdefault(sqe, []).append(cqe)
+        self._done.clear()
+        return [done[sqe].pop() for sqe in sqes]
+
+    def worker(self) -> None:
+        while True:
+            with self._lock:
+                inbox, self._inbox = self._inbox, []
+            for sqe, action in inbox:
+                if action == _SUBMIT:
+                    self._aio.started([sqe])
+                    self._begin(sqe)
+                elif action == _CANCEL:
+                    self._cancel(sqe)
+                elif sqe in self._ops:
+                    # the future it waited for is done, unless it was cancelled meanwhile
+                    self._advance(sqe)
+            self._publish()
+
+            with self._lock:
+                if self._closing and self._inflight == 0:
+                    return
+            self._poll(None)
+
+    def _wake(self) -> None:
+        # futures may resume an operation cancelled meanwhile, after the worker exited
+        if self._wakeup is not None:
+            with contextlib.suppress(OSError):
+                self._wakeup[1].send(b"\0")
+
+    def _resume(self, sqe: SQE[NetSubmission, Any], _: Future[Any]) -> None:
+        with self._lock:
+            self._inbox.append((sqe, _RESUME))
+        self._wake()
+
+    def _poll(self, timeout: float | None) -> None:
+        for key, _ in self._selector.select(timeout):
+            sock = key.fileobj
+            assert isinstance(sock, socket.socket)
+            match key.data:
+                case None:
+                    # the wakeup socket, its bytes only serve to interrupt select
+                    with contextlib.suppress(BlockingIOError):
+                        while sock.recv(4_096):
+                            pass
+                case (str() as host, int() as port):
+                    # idle connections are only readable once the peer closed them
+                    self._selector.unregister(sock)
+                    self._idle[host, port].remove(sock)
+                    sock.close()
+                case sqe:
+                    self._selector.unregister(sock)
+                    del self._waiting[sqe]
+                    self._advance(sqe)
+
+    def _publish(self) -> None:
+        if not self._done:
+            return
+        done, self._done = self._done, []
+        self._aio.enqueue_many([(cqe, self.kind) for _, cqe in done])
+        with self._lock:
+            self._inflight -= len(done)
+
+    def _begin(self, sqe: SQE[NetSubmission, Any]) -> None:
+        self._ops[sqe] = self._run(sqe.v)
+        self._advance(sqe)
+
+    def _advance(self, sqe: SQE[NetSubmission, Any]) -> None:
+        try:
+            wait = next(self._ops[sqe])
+        except StopIteration as e:
+            del self._ops[sqe]
+            self._done.append((sqe, CQE(e.value, sqe.cb)))
+        except Exception as e:
+            del self._ops[sqe]
+            self._done.append((sqe, CQE(e, sqe.cb)))
+        else:
+            if isinstance(wait, Future):
+                wait.add_done_callback(partial(self._resume, sqe))
+            else:
+                sock, events = wait
+                self._selector.register(sock, events, sqe)
+                self._waiting[sqe] = sock
+
+    def _cancel(self, sqe: SQE[NetSubmission, Any]) -> None:
+        if (op := self._ops.pop(sqe, None)) is None:
+            # completed already
+            return
+        if (sock := self._waiting.pop(sqe, None)) is not None:
+            self._selector.unregister(sock)
+        op.close()
+        with self._lock:
+            self._inflight -= 1
+
+    def _run(self, v: NetSubmission) -> _Op[Any]:
+        match v:
+            case Connect(host=host, port=port):
+                sock, _ = yield from self._checkout(host, port)
+                i = next(self._ids)
+                self._connections[i] = sock
+                return Connection(i, host, port)
+            case Send(conn=conn, data=data):
+                yield from _send(self._connection(conn), data)
+                return len(data)
+            case Recv(conn=conn, size=size):
+                return (yield from _recv(self._connection(conn), size))
+            case Release(conn=conn, reuse=reuse):
+                self._checkin(conn.host, conn.port, self._connection(conn), reuse=reuse)
+                del self._connections[conn.id]
+                return None
+            case Request():
+                return (yield from self._request(v))
+
+    def _request(self, v: Request) -> _Op[bytes]:
+        sock, pooled = yield from self._checkout(v.host, v.port)
+        try:
+            buf, end = yield from self._exchange(sock, v)
+        except OSError:
+            if not pooled:
+                raise
+            buf, end = bytearray(), None
+
+        if pooled and end is None and not buf:
+            # the peer closed the pooled connection before it was used, try a new one
+            sock = yield from self._open(v.host, v.port)
+            buf, end = yield from self._exchange(sock, v)
+
+        # only a connection the response ended on exactly can be used again
+        self._checkin(v.host, v.port, sock, reuse=end == len(buf))
+        return bytes(buf if end is None else buf[:end])
+
+    def _exchange(self, sock: socket.socket, v: Request) -> _Op[tuple[bytearray, int | None]]:
+        """Send the request and read its response, None as its end means EOF."""
+        buf = bytearray()
+        start = 0
+        end = None
+        done = False
+        try:
+            yield from _send(sock, v.data)
+            while (end := _end(buf, start, v)) is None:
+                # a delimiter may straddle what was read already and the next chunk
+                start = max(len(buf) - len(v.delimiter or b"") + 1, 0)
+                if not (data := (yield from _recv(sock, self._chunk_size))):
+                    break
+                buf += data
+            done = True
+        finally:
+            # a connection left mid request can't be reused
+            if not done:
+                sock.close()
+        return buf, end
+
+    def _connection(self, conn: Connection) -> socket.socket:
+        if (sock := self._connections.get(conn.id)) is None:
+            msg = f"unknown connection {conn.id}"
+            raise ValueError(msg)
+        # connections handed out are only registered while an operation waits on them
+        if sock in self._selector.get_map():
+            msg = f"connection {conn.id} is busy"
+            raise RuntimeError(msg)
+        return sock
+
+    def _checkout(self, host: str, port: int) -> _Op[tuple[socket.socket, bool]]:
+        if idle := self._idle.get((host, port)):
+            sock = idle.pop()
+            self._selector.unregister(sock)
+            return sock, True
+        return (yield from self._open(host, port)), False
+
+    def _open(self, host: str, port: int) -> _Op[socket.socket]:
+        infos = yield from self._resolve(host, port)
+        for info in infos[:-1]:
+            with contextlib.suppress(OSError):
+                return (yield from _connect(info))
+        return (yield from _connect(infos[-1]))
+
+    def _resolve(self, host: str, port: int) -> _Op[Sequence[_Address]]:
+        try:
+            # addresses resolve without a lookup
+            return socket.getaddrinfo(
+                host, port, type=socket.SOCK_STREAM, flags=socket.AI_NUMERICHOST
+            )
+        except socket.gaierror:
+            pass
+        if self._future is None:
+            # driven by process, there's no selector thread to hold up
+            return socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+
+        # lookups block, so they run on the pool while the selector goes on
+        assert self._pool is not None
+        f = self._pool.submit(socket.getaddrinfo, host, port, type=socket.SOCK_STREAM)
+        yield f
+        return f.result()
+
+    def _checkin(self, host: str, port: int, sock: socket.socket, *, reuse: bool) -> None:
+        idle = self._idle.setdefault((host, port), [])
+        if reuse and len(idle) < self._keepalive:
+            idle.append(sock)
+            self._selector.register(sock, selectors.EVENT_READ, (host, port))
+        else:
+            sock.close()
@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING, Any
+
+from pio.bus import CQE, SQE
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+    from pathlib import Path
+
+    from pio.typing import AIO
+
+
+_KIND = "process"
+
+# without pidfds children whose pipes are closed are polled for their exit
+_POLL = 0.01
+
+_STDIN = 0
+_STDOUT = 1
+_STDERR = 2
+_EXIT = 3
+
+
+@dataclass(frozen=True)
+class Run:
+    argv: tuple[str, ...]
+    stdin: bytes | None = None
+    cwd: str | Path | None = None
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Completed:
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+
+
+class _Output:
+    """A pooled buffer that keeps its capacity, only the first n bytes are output."""
+
+    __slots__ = ("buffer", "n")
+
+    def __init__(self, buffer: bytearray) -> None:
+        self.buffer = buffer
+        self.n = 0
+
+    def read(self, pipe: io.FileIO, chunk_size: int) -> bool:
+        if self.n == len(self.buffer):
+            self.buffer.extend(bytes(max(len(self.buffer), chunk_size)))
+        with memoryview(self.buffer) as view, view[self.n :] as rest:
+            n = pipe.readinto(rest)
+        if n is None:
+            # nothing to read after all
+            return True
+        self.n += n
+        return n > 0
+
+    def value(self) -> bytes:
+        with memoryview(self.buffer) as view:
+            return bytes(view[: self.n])
+
+
+class _Child:
+    __slots__ = ("exited", "open", "pidfd", "proc", "sqe", "stderr", "stdin", "stdout")
+
+    def __init__(
+        self,
+        sqe: SQE[Run, Completed],
+        proc: subprocess.Popen[bytes],
+        stdout: _Output,
+        stderr: _Output,
+    ) -> None:
+        self.sqe = sqe
+        self.proc = proc
+        self.stdin = memoryview(sqe.v.stdin or b"")
+        self.stdout = stdout
+        self.stderr = stderr
+        self.open = 0
+        self.pidfd: int | None = None
+        self.exited = False
+
+
+class ProcessSubsystem:
+    """Runs child processes, completing with their exit code and output.
+
+    A single selector thread launches the children, writes their stdin and reads their
+    stdout and stderr into pooled buffers, so a running child holds no thread of the
+    pool. Children are reaped when their pidfd becomes readable where the platform has
+    them, and polled once their pipes are closed otherwise. At most max_children run at
+    once, the others wait in launch order.
+    """
+
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+        *,
+        max_children: int = 8,
+        chunk_size: int = 65_536,
+    ) -> None:
+        assert size > 0, "size must be positive"
+        assert max_children > 0, "max children must be positive"
+        assert chunk_size > 0, "chunk size must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._size = size
+        self._max_children = max_children
+        self._chunk_size = chunk_size
+        self._future: Future[None] | None = None
+
+        # submissions and cancellations reach the selector thread through the inbox,
+        # a byte on the wakeup socket interrupts its select
+        self._lock = threading.Lock()
+        self._inbox: list[tuple[SQE[Run, Completed], bool]] = []
+        self._inflight = 0
+        self._closing = False
+        self._wakeup: tuple[socket.socket, socket.socket] | None = None
+
+        # everything else is only touched by the thread running the selector
+        self._selector = selectors.DefaultSelector()
+        self._pending: deque[SQE[Run, Completed]] = deque()
+        self._children: dict[SQE[Run, Completed], _Child] = {}
+        self._buffers: list[bytearray] = []
+        self._done: list[tuple[SQE[Run, Completed], CQE]] = []
+
+        if sys.platform == "win32":
+            msg = "pipes can't be selected on windows"
+            raise RuntimeError(msg)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def depth(self) -> int:
+        return self._inflight
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    def start(self) -> None:
+        assert self._pool is not None
+        if self._future is None:
+            r, w = socket.socketpair()
+            r.setblocking(False)  # noqa: FBT003
+            w.setblocking(False)  # noqa: FBT003
+            self._selector.register(r, selectors.EVENT_READ)
+            self._wakeup = (r, w)
+            self._closing = False
+            self._future = self._pool.submit(self.worker)
+
+    def shutdown(self) -> None:
+        if self._future is not None:
+            assert self._wakeup is not None
+            with self._lock:
+                self._closing = True
+            self._wake()
+            assert self._future.result() is None
+            self._future = None
+
+            r, w = self._wakeup
+            self._selector.unregister(r)
+            r.close()
+            w.close()
+            self._wakeup = None
+
+    def enqueue(self, sqe: SQE[Run, Completed]) -> bool:
+        assert sqe.v.kind == _KIND
+        with self._lock:
+            if self._inflight >= self._size:
+                return False
+            self._inflight += 1
+            self._inbox.append((sqe, False))
+        self._wake()
+        return True
+
+    def cancel(self, sqe: SQE[Run, Completed]) -> None:
+        with self._lock:
+            if (sqe, False) in self._inbox:
+                self._inbox.remove((sqe, False))
+                self._inflight -= 1
+                return
+            self._inbox.append((sqe, True))
+        self._wake()
+
+    def flush(self, time: int) -> None:
+        return
+
+    def next_deadline(self) -> int | None:
+        return None
+
+    def process(self, sqes: list[SQE[Run, Completed]]) -> list[CQE]:
+        self._pending.extend(sqes)
+        while self._pending or self._children:
+            self._launch()
+            if self._children:
+                self._poll()
+
+        # completions come in as they finish, they are handed back in submission order
+        done: dict[SQE[Run, Completed], list[CQE]] = {}
+        for sqe, cqe in self._done:
+            done.setdefault(sqe, []).append(cqe)
+        self._done.clear()
+        return [done[sqe].pop() for sqe in sqes]
+
+    def worker(self) -> None:
+        while True:
+            with self._lock:
+                inbox, self._inbox = self._inbox, []
+            for sqe, cancel in inbox:
+                if cancel:
+                    self._cancel(sqe)
+                else:
+                    self._pending.append(sqe)
+            if launched := self._launch():
+                self._aio.started(launched)
+            self._publish()
+
+            with self._lock:
+                if self._closing and self._inflight == 0:
+                    return
+            self._poll()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            with contextlib.suppress(BlockingIOError):
+                self._wakeup[1].send(b"\0")
+
+    def _publish(self) -> None:
+        if not self._done:
+            return
+        done, self._done = self._done, []
+        self._aio.enqueue_many([(cqe, self.kind) for _, cqe in done])
+        with self._lock:
+            self._inflight -= len(done)
+
+    def _launch(self) -> list[SQE[Run, Completed]]:
+        launched: list[SQE[Run, Completed]] = []
+        while self._pending and len(self._children) < self._max_children:
+            sqe = self._pending.popleft()
+            launched.append(sqe)
+            try:
+                proc = subprocess.Popen(  # noqa: S603
+                    sqe.v.argv,
+                    bufsize=0,
+                    stdin=subprocess.DEVNULL if sqe.v.stdin is None else subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=sqe.v.cwd,
+                )
+            except Exception as e:
+                # a bad submission fails on its own, the selector thread goes on
+                self._done.append((sqe, CQE(e, sqe.cb)))
+                continue
+
+            child = _Child(sqe, proc, _Output(self._acquire()), _Output(self._acquire()))
+            self._children[sqe] = child
+            try:
+                self._watch(child)
+            except Exception as e:
+                self._kill(child)
+                self._done.append((sqe, CQE(e, sqe.cb)))
+        return launched
+
+    def _watch(self, child: _Child) -> None:
+        proc = child.proc
+        if proc.stdin is not None:
+            self._register(child, proc.stdin, selectors.EVENT_WRITE, _STDIN)
+        assert proc.stdout is not None
+        assert proc.stderr is not None
+        self._register(child, proc.stdout, selectors.EVENT_READ, _STDOUT)
+        self._register(child, proc.stderr, selectors.EVENT_READ, _STDERR)
+        if sys.platform == "linux":
+            try:
+                pidfd = os.pidfd_open(proc.pid)
+            except OSError:
+                # no pidfds after all, the child is polled once its pipes are closed
+                return
+            child.pidfd = pidfd
+            self._selector.register(pidfd, selectors.EVENT_READ, (child, _EXIT))
+
+    def _register(self, child: _Child, pipe: IO[bytes], events: int, stream: int) -> None:
+        os.set_blocking(pipe.fileno(), False)
+        self._selector.register(pipe, events, (child, stream))
+        child.open += 1
+
+    def _poll(self) -> None:
+        # children without a pidfd that closed their pipes are still to be reaped
+        polling = any(c.open == 0 and c.pidfd is None for c in self._children.values())
+        for key, _ in self._selector.select(_POLL if polling else None):
+            if key.data is None:
+                # the wakeup socket, its bytes only serve to interrupt select
+                sock = key.fileobj
+                assert isinstance(sock, socket.socket)
+                with contextlib.suppress(BlockingIOError):
+                    while sock.recv(4_096):
+                        pass
+                continue
+
+            child, stream = key.data
+            if stream == _EXIT:
+                self._selector.unregister(key.fileobj)
+                os.close(key.fd)
+                child.pidfd = None
+                child.exited = True
+            elif stream == _STDIN:
+                self._write(child, key.fileobj)
+            else:
+                # unbuffered pipes are raw files, read into the pooled buffer directly
+                assert isinstance(key.fileobj, io.FileIO)
+                output = child.stdout if stream == _STDOUT else child.stderr
+                if not output.read(key.fileobj, self._chunk_size):
+                    self._close(child, key.fileobj)
+
+        for child in list(self._children.values()):
+            if child.open == 0 and (
+                child.exited or (child.pidfd is None and child.proc.poll() is not None)
+            ):
+                self._complete(child)
+
+    def _write(self, child: _Child, pipe: Any) -> None:
+        try:
+            n = os.write(pipe.fileno(), child.stdin)
+        except BlockingIOError:
+            return
+        except BrokenPipeError:
+            # the child doesn't read all of its input
+            n = len(child.stdin)
+        child.stdin = child.stdin[n:]
+        if not child.stdin:
+            self._close(child, pipe)
+
+    def _close(self, child: _Child, pipe: Any) -> None:
+        self._selector.unregister(pipe)
+        pipe.close()
+        child.open -= 1
+
+    def _complete(self, child: _Child) -> None:
+        # the child has exited, so wait doesn't block
+        returncode = child.proc.wait()
+        del self._children[child.sqe]
+        v = Completed(returncode, child.stdout.value(), child.stderr.value())
+        self._release(child)
+        self._done.append((child.sqe, CQE(v, child.sqe.cb)))
+
+    def _cancel(self, sqe: SQE[Run, Completed]) -> None:
+        if sqe in self._pending:
+            self._pending.remove(sqe)
+        elif (child := self._children.get(sqe)) is not None:
+            self._kill(child)
+        else:
+            # completed already
+            return
+        with self._lock:
+            self._inflight -= 1
+
+    def _kill(self, child: _Child) -> None:
+        # killed children exit right away, waiting for them here is brief
+        del self._children[child.sqe]
+        child.proc.kill()
+        registered = self._selector.get_map()
+        for pipe in (child.proc.stdin, child.proc.stdout, child.proc.stderr):
+            if pipe is not None and not pipe.closed:
+                if pipe in registered:
+                    self._close(child, pipe)
+                else:
+                    pipe.close()
+        if child.pidfd is not None:
+            self._selector.unregister(child.pidfd)
+            os.close(child.pidfd)
+        child.proc.wait()
+        self._release(child)
+
+    def _acquire(self) -> bytearray:
+        return self._buffers.pop() if self._buffers else bytearray()
+
+    def _release(self, child: _Child) -> None:
+        # a couple of buffers per child slot are kept, with the capacity they grew to
+        for output in (child.stdout, child.stderr):
+            if len(self._buffers) < 2 * self._max_children:
+                self._buffers.append(output.buffer)
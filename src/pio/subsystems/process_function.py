@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import pickle
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from pio.buffer import SharedBuffer
+from pio.bus import CQE, SQE
+from pio.subsystems import SubmissionQueue, discard
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from concurrent.futures import Future, ThreadPoolExecutor
+    from multiprocessing.context import BaseContext
+
+    from pio.typing import AIO
+
+
+_KIND = "process_function"
+
+
+@dataclass(frozen=True)
+class ProcessFunctionSubmission:
+    fn: Callable[[], Any]
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+def _dumps(fn: Callable[[], Any]) -> bytes:
+    try:
+        return pickle.dumps(fn)
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        msg = (
+            f"{fn!r} can't be pickled to run in a process, "
+            "use a module level function or a functools.partial of one"
+        )
+        raise TypeError(msg) from e
+
+
+def _run(payload: bytes) -> Any:
+    return pickle.loads(payload)()  # noqa: S301
+
+
+def _run_remote(payload: bytes) -> Any:
+    v = _run(payload)
+    # a shared buffer returned from the process is owned by the receiving side
+    return v.send() if isinstance(v, SharedBuffer) else v
+
+
+class ProcessFunctionSubsystem:
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+        workers: int = 1,
+        *,
+        processes: int | None = None,
+        mp_context: BaseContext | None = None,
+    ) -> None:
+        assert size > 0, "size must be positive"
+        assert workers > 0, "workers must be positive"
+        assert processes is None or processes > 0, "processes must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._sq = SubmissionQueue[SQE[ProcessFunctionSubmission, Any]](size)
+        self._workers = workers
+        self._futures: list[Future[None]] = []
+
+        self._processes = processes
+        self._mp_context = mp_context
+        self._executor: ProcessPoolExecutor | None = None
+
+        # bounds the callables handed to the process pool but not yet completed.
+        self._inflight = threading.BoundedSemaphore(size)
+
+    @property
+    def size(self) -> int:
+        return self._sq.maxsize
+
+    @property
+    def depth(self) -> int:
+        return self._sq.qsize()
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    def start(self) -> None:
+        assert self._pool is not None
+        if len(self._futures) == 0:
+            self._executor = ProcessPoolExecutor(self._processes, mp_context=self._mp_context)
+            for _ in range(self._workers):
+                self._futures.append(self._pool.submit(self.worker))
+
+    def shutdown(self) -> None:
+        if len(self._futures) > 0:
+            assert len(self._futures) == self._workers
+            assert self._executor is not None
+            self._sq.shutdown()
+            for f in self._futures:
+                assert f.result() is None
+
+            self._executor.shutdown()
+            self._executor = None
+            self._futures.clear()
+            self._sq.join()
+
+    def enqueue(self, sqe: SQE[ProcessFunctionSubmission, Any]) -> bool:
+        assert sqe.v.kind == _KIND
+        try:
+            self._sq.put_nowait(sqe)
+        except queue.Full:
+            return False
+        return True
+
+    def cancel(self, sqe: SQE) -> None:
+        discard(self._sq, sqe)
+
+    def flush(self, time: int) -> None:
+        return
+
+    def next_deadline(self) -> int | None:
+        return None
+
+    def process(self, sqes: list[SQE[ProcessFunctionSubmission, Any]]) -> list[CQE]:
+        cqes: list[CQE] = []
+        for sqe in sqes:
+            try:
+                v = _run(_dumps(sqe.v.fn))
+            except Exception as e:
+                v = e
+            cqes.append(CQE(v, sqe.cb))
+        return cqes
+
+    def worker(self) -> None:
+        assert self._executor is not None
+        while True:
+            try:
+                sqe = self._sq.get()
+            except queue.ShutDown:
+                break
+
+            self._aio.started([sqe])
+            try:
+                payload = _dumps(sqe.v.fn)
+            except TypeError as e:
+                self._aio.enqueue((CQE(e, sqe.cb), self.kind))
+            else:
+                self._inflight.acquire()
+                f = self._executor.submit(_run_remote, payload)
+                f.add_done_callback(lambda f, sqe=sqe: self._complete(sqe, f))
+            self._sq.task_done()
+
+    def _complete(self, sqe: SQE[ProcessFunctionSubmission, Any], f: Future[Any]) -> None:
+        try:
+            v = f.result()
+        except Exception as e:
+            v = e
+        self._inflight.release()
+        self._aio.enqueue((CQE(v, sqe.cb), self.kind))
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any
+
+from pio.bus import CQE, SQE
+from pio.subsystems import SubmissionQueue, Workers, discard
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from pathlib import Path
+
+    from pio.typing import AIO
+
+
+_KIND = "sqlite"
+
+_WRITES = ("insert", "update", "delete", "replace")
+
+
+@dataclass(frozen=True)
+class Query:
+    sql: str
+    params: tuple[Any, ...] | dict[str, Any] = ()
+    # a write that may be merged with identical ones into an executemany
+    many: bool = False
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Rows:
+    rows: tuple[tuple[Any, ...], ...]
+    rowcount: int
+    lastrowid: int | None
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+def _writes(q: Query) -> bool:
+    sql = q.sql.lstrip().lower()
+    return sql.startswith(_WRITES) and "returning" not in sql
+
+
+class SqliteSubsystem:
+    """Runs queries against a SQLite database on pooled connections.
+
+    Every batch a worker takes runs in a single transaction, each query under its own
+    savepoint so a failing one only fails its own submission. Consecutive writes with
+    the same sql that opt in with many go through one executemany, their completions
+    carry no rowcount or lastrowid then. Statements must not manage transactions
+    themselves, and as every pooled connection to ":memory:" is a database of its own,
+    the database is a file.
+    """
+
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+        workers: int = 1,
+        batch_size: int = 100,
+        *,
+        database: str | Path,
+        timeout: float = 5.0,
+        max_workers: int | None = None,
+        idle: int = 1_000,
+    ) -> None:
+        assert size > 0, "size must be positive"
+        assert batch_size > 0, "batch size must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._sq = SubmissionQueue[SQE[Query, Rows]](size)
+        self._workers = Workers(pool, workers, max_workers, idle=idle)
+        self._batch_size = batch_size
+
+        self._database = database
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    @property
+    def size(self) -> int:
+        return self._sq.maxsize
+
+    @property
+    def depth(self) -> int:
+        return self._sq.qsize()
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def start(self) -> None:
+        self._workers.start(self.worker)
+
+    def shutdown(self) -> None:
+        if self._workers.started:
+            self._sq.shutdown()
+            self._workers.join()
+            self._sq.join()
+
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def enqueue(self, sqe: SQE[Query, Rows]) -> bool:
+        assert sqe.v.kind == _KIND
+        try:
+            self._sq.put_nowait(sqe)
+        except queue.Full:
+            return False
+        self._workers.arrived()
+        return True
+
+    def cancel(self, sqe: SQE) -> None:
+        discard(self._sq, sqe)
+
+    def flush(self, time: int) -> None:
+        self._workers.scale(time, self._sq.qsize(), self._batch_size)
+
+    def next_deadline(self) -> int | None:
+        return None
+
+    def process(self, sqes: list[SQE[Query, Rows]]) -> list[CQE[Rows]]:
+        conn = self._acquire()
+        try:
+            results = self._transaction(conn, [sqe.v for sqe in sqes])
+        except sqlite3.Error as e:
+            # the savepoints themselves failed, nothing of the batch is committed
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [e] * len(sqes)
+        finally:
+            self._release(conn)
+        return [CQE(v, sqe.cb) for v, sqe in zip(results, sqes, strict=True)]
+
+    def worker(self) -> None:
+        while (sqe := self._workers.get(self._sq)) is not None:
+            sqes = [sqe]
+            while len(sqes) < self._batch_size:
+                try:
+                    sqes.append(self._sq.get_nowait())
+                except (queue.Empty, queue.ShutDown):
+                    break
+
+            self._aio.started(sqes)
+            start = perf_counter_ns()
+            cqes = self.process(sqes)
+            self._workers.served(len(sqes), perf_counter_ns() - start)
+            self._aio.enqueue_many([(cqe, self.kind) for cqe in cqes])
+            for _ in sqes:
+                self._sq.task_done()
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._connections:
+                return self._connections.pop()
+        # transactions are managed here, not by the sqlite3 module
+        return sqlite3.connect(
+            self._database, timeout=self._timeout, isolation_level=None, check_same_thread=False
+        )
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._connections.append(conn)
+
+    def _transaction(
+        self, conn: sqlite3.Connection, queries: list[Query]
+    ) -> list[Rows | Exception]:
+        writes = [_writes(q) for q in queries]
+        try:
+            # take the write lock up front, upgrading a read lock later may deadlock
+            conn.execute("BEGIN IMMEDIATE" if any(writes) else "BEGIN")
+        except sqlite3.Error as e:
+            return [e] * len(queries)
+
+        results: list[Rows | Exception] = []
+        i = 0
+        while i < len(queries):
+            j = i + 1
+            if writes[i] and queries[i].many:
+                while (
+                    j < len(queries)
+                    and writes[j]
+                    and queries[j].many
+                    and queries[j].sql == queries[i].sql
+                ):
+                    j += 1
+
+            if j - i > 1 and self._executemany(conn, queries[i:j]):
+                results.extend(Rows((), -1, None) for _ in range(i, j))
+            else:
+                results.extend(self._execute(conn, q) for q in queries[i:j])
+            i = j
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            return [e] * len(queries)
+        return results
+
+    def _execute(self, conn: sqlite3.Connection, q: Query) -> Rows | Exception:
+        conn.execute("SAVEPOINT query")
+        try:
+            cursor = conn.execute(q.sql, q.params)
+            v: Rows | Exception = Rows(tuple(cursor.fetchall()), cursor.rowcount, cursor.lastrowid)
+        except Exception as e:
+            conn.execute("ROLLBACK TO query")
+            v = e
+        conn.execute("RELEASE query")
+        return v
+
+    def _executemany(self, conn: sqlite3.Connection, queries: list[Query]) -> bool:
+        conn.execute("SAVEPOINT many")
+        try:
+            conn.executemany(queries[0].sql, [q.params for q in queries])
+        except Exception:
+            # run them one by one, so only the failing ones fail
+            conn.execute("ROLLBACK TO many")
+            conn.execute("RELEASE many")
+            return False
+        conn.execute("RELEASE many")
+        return True
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from pio.bus import CQE, SQE
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from pio.typing import AIO
+
+
+_KIND = "timer"
+
+
+@dataclass(frozen=True)
+class Sleep:
+    ms: int
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+@dataclass(frozen=True)
+class Deadline:
+    time: int
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+
+class TimerSubsystem:
+    """Fires Sleep and Deadline submissions from flush, without worker threads.
+
+    Submissions are converted to absolute deadlines against the time of the flush that
+    follows them, kept in a heap and completed with the flush time once it reaches
+    their deadline. Flush runs on the loop that consumes the completions, so fired
+    timers are put without blocking, what doesn't fit is put by the next flush.
+    """
+
+    def __init__(
+        self,
+        aio: AIO,
+        pool: ThreadPoolExecutor | None = None,
+        size: int = 100,
+    ) -> None:
+        assert size > 0, "size must be positive"
+
+        self._aio = aio
+        self._pool = pool
+        self._size = size
+
+        self._pending: list[SQE[Sleep | Deadline, int]] = []
+        self._timers: list[tuple[int, int, SQE[Sleep | Deadline, int]]] = []
+        self._seq = itertools.count()
+        self._fired: list[tuple[CQE, str]] = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending) + len(self._timers) + len(self._fired)
+
+    @property
+    def kind(self) -> str:
+        return _KIND
+
+    def start(self) -> None:
+        return
+
+    def shutdown(self) -> None:
+        return
+
+    def enqueue(self, sqe: SQE[Sleep | Deadline, int]) -> bool:
+        assert sqe.v.kind == _KIND
+        if self.depth >= self._size:
+            return False
+        self._pending.append(sqe)
+        return True
+
+    def cancel(self, sqe: SQE[Sleep | Deadline, int]) -> None:
+        if sqe in self._pending:
+            self._pending.remove(sqe)
+            return
+
+        for i, (_, _, timer) in enumerate(self._timers):
+            if timer is sqe:
+                self._timers[i] = self._timers[-1]
+                self._timers.pop()
+                heapq.heapify(self._timers)
+                return
+
+        for i, (cqe, _) in enumerate(self._fired):
+            if cqe.cb is sqe.cb:
+                del self._fired[i]
+                return
+
+    def flush(self, time: int) -> None:
+        self._aio.started(self._pending)
+        for sqe in self._pending:
+            match sqe.v:
+                case Sleep(ms):
+                    deadline = time + ms
+                case Deadline(t):
+                    deadline = t
+            heapq.heappush(self._timers, (deadline, next(self._seq), sqe))
+        self._pending.clear()
+
+        while self._timers and self._timers[0][0] <= time:
+            _, _, sqe = heapq.heappop(self._timers)
+            self._fired.append((CQE(time, sqe.cb), self.kind))
+
+        if self._fired:
+            n = self._aio.enqueue_many(self._fired, block=False)
+            del self._fired[:n]
+
+    def next_deadline(self) -> int | None:
+        if self._pending or self._fired:
+            return 0
+        if self._timers:
+            return self._timers[0][0]
+        return None
+
+    def process(self, sqes: list[SQE[Sleep | Deadline, int]]) -> list[CQE]:
+        self._pending.extend(sqes)
+        return []
+
+    def worker(self) -> None:
+        return
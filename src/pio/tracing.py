@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import threading
+from pathlib import Path
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def _us(ns: int) -> float:
+    return ns / 1_000
+
+
+def _name(v: Any) -> str:
+    # generators, coroutines and functions carry their own name, submissions their type's
+    return getattr(v, "__qualname__", None) or type(v).__name__
+
+
+class Tracer:
+    """Records computations, their steps and their submissions as Chrome trace events.
+
+    Every computation is an async span from the moment it is added or spawned until it
+    settles, with the computation it was spawned from as its parent. Steps are complete
+    events on the thread that ran them, carrying the CPU time spent in the generator.
+    Submissions are async spans split into the time queued in the subsystem, the time
+    in service and the time their completion waited to be dequeued.
+
+    The result loads in chrome://tracing and in Perfetto.
+    """
+
+    def __init__(self) -> None:
+        self._pid = os.getpid()
+        self._seq = itertools.count(1)
+        self._events: list[dict[str, Any]] = []
+
+        # submissions are linked to their computation by callback until dequeued, or until
+        # the computation ends when they never reach a subsystem, like journal replays
+        self._ids: dict[object, tuple[int, str, Callable[[Any], None] | None]] = {}
+        self._links: dict[Callable[[Any], None], int] = {}
+        self._sqes: dict[Callable[[Any], None], list[Any]] = {}
+
+    @property
+    def events(self) -> list[dict[str, Any]]:
+        return self._events
+
+    def begin(
+        self,
+        comp: object,
+        v: Any,
+        parent: object | None = None,
+        cb: Callable[[Any], None] | None = None,
+    ) -> None:
+        i, name, _ = self._ids[comp] = (next(self._seq), _name(v), cb)
+        args: dict[str, Any] = {"computation": i}
+        if parent is not None and (p := self._ids.get(parent)) is not None:
+            args["parent"] = p[0]
+        if cb is not None:
+            self._links[cb] = i
+
+        self._async("b", "computation", i, name, perf_counter_ns(), args=args)
+
+    def end(self, comp: object, *, failed: bool = False) -> None:
+        if (ids := self._ids.pop(comp, None)) is None:
+            return
+        i, name, cb = ids
+        if cb is not None:
+            self._links.pop(cb, None)
+        self._async("e", "computation", i, name, perf_counter_ns(), args={"failed": failed})
+
+    def step(self, comp: object, v: Any, start: int, cpu: int) -> None:
+        self._events.append(
+            {
+                "name": _name(v),
+                "cat": "step",
+                "ph": "X",
+                "ts": _us(start),
+                "dur": _us(perf_counter_ns() - start),
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": {"computation": self._ids.get(comp, (None,))[0], "cpu_us": _us(cpu)},
+            }
+        )
+
+    def dispatched(self, cb: Callable[[Any], None], kind: str) -> None:
+        now = perf_counter_ns()
+        self._sqes[cb] = [next(self._seq), kind, now, now, now]
+
+    def started(self, cb: Callable[[Any], None]) -> None:
+        if (sqe := self._sqes.get(cb)) is not None:
+            sqe[3] = perf_counter_ns()
+
+    def completed(self, cb: Callable[[Any], None]) -> None:
+        if (sqe := self._sqes.get(cb)) is not None:
+            sqe[4] = perf_counter_ns()
+
+    def cancelled(self, cb: Callable[[Any], None]) -> None:
+        self._sqes.pop(cb, None)
+        self._links.pop(cb, None)
+
+    def dequeued(self, cb: Callable[[Any], None]) -> None:
+        if (sqe := self._sqes.pop(cb, None)) is None:
+            return
+
+        i, kind, dispatched, started, completed = sqe
+        started = max(started, dispatched)
+        completed = max(completed, started)
+        now = perf_counter_ns()
+
+        args = {"computation": self._links.pop(cb, None)}
+        self._async("b", "aio", i, kind, dispatched, args=args)
+        for name, start, end in (
+            ("queued", dispatched, started),
+            ("service", started, completed),
+            ("completion", completed, now),
+        ):
+            self._async("b", "aio", i, name, start)
+            self._async("e", "aio", i, name, end)
+        self._async("e", "aio", i, kind, now)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        return {"traceEvents": list(self._events), "displayTimeUnit": "ms"}
+
+    def dump(self, path: str | Path) -> None:
+        with Path(path).open("w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def _async(
+        self,
+        ph: str,
+        cat: str,
+        i: int,
+        name: str,
+        ns: int,
+        *,
+        args: dict[str, Any] | None = None,
+    ) -> None:
+        event: dict[str, Any] = {
+            "name": name,
+            "cat": cat,
+            "ph": ph,
+            "id": i,
+            "ts": _us(ns),
+            "pid": self._pid,
+            "tid": 0,
+        }
+        if args is not None:
+            event["args"] = args
+        self._events.append(event)
@@ -3,7 +3,11 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Protocol
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from pio.bus import CQE, SQE
+    from pio.metrics import Metrics
+    from pio.tracing import Tracer
 
 
 class Kind(Protocol):
@@ -14,19 +18,30 @@ class Kind(Protocol):
 class SubSystem(Kind, Protocol):
     @property
     def size(self) -> int: ...
+    @property
+    def depth(self) -> int: ...
     def start(self) -> None: ...
     def shutdown(self) -> None: ...
     def flush(self, time: int) -> None: ...
+    def next_deadline(self) -> int | None: ...
     def enqueue(self, sqe: SQE) -> bool: ...
+    def cancel(self, sqe: SQE) -> None: ...
     def process(self, sqes: list[SQE]) -> list[CQE]: ...
     def worker(self) -> None: ...
 
 
 class AIO(Protocol):
     def attach_subsystem(self, subsystem: SubSystem) -> None: ...
+    def attach_notifier(self, notify: Callable[[], None]) -> None: ...
+    def attach_metrics(self, metrics: Metrics) -> None: ...
+    def attach_tracer(self, tracer: Tracer) -> None: ...
     def start(self) -> None: ...
     def shutdown(self) -> None: ...
     def flush(self, time: int) -> None: ...
+    def next_deadline(self) -> int | None: ...
     def dispatch(self, sqe: SQE) -> None: ...
+    def cancel(self, sqe: SQE) -> None: ...
+    def started(self, sqes: list[SQE]) -> None: ...
     def dequeue(self, n: int) -> list[CQE]: ...
     def enqueue(self, cqe: tuple[CQE, str]) -> None: ...
+    def enqueue_many(self, cqes: list[tuple[CQE, str]], *, block: bool = True) -> int: ...
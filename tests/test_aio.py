@@ -1,16 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import multiprocessing
+import queue
 import random
+import socketserver
+import sys
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from pio.aio import AIODst, AIOSystem
+import pytest
+
+from pio.aio import AIODst, AIOSystem, CompletionQueue
 from pio.bus import CQE, SQE
+from pio.subsystems.asyncio import AsyncioSubsystem
 from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+from pio.subsystems.file import Append, FileSubsystem, ReadFile, ReadRange, WriteFile
 from pio.subsystems.function import FunctionSubsystem
+from pio.subsystems.net import (
+    Connect,
+    Connection,
+    NetSubmission,
+    NetSubsystem,
+    Recv,
+    Release,
+    Request,
+    Send,
+)
+from pio.subsystems.process import Completed, ProcessSubsystem, Run
+from pio.subsystems.process_function import (
+    ProcessFunctionSubmission,
+    ProcessFunctionSubsystem,
+)
+from pio.subsystems.sqlite import Query, Rows, SqliteSubsystem
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Sequence
+    from pathlib import Path
 
 
 def test_aio_system() -> None:
@@ -81,3 +110,662 @@ def test_aio_dst() -> None:
 
     for cqe in cqes:
         cqe.cb(cqe.v)
+
+
+def test_aio_dst_batches() -> None:
+    # several submissions of a kind in one flush are processed as one batch
+    def _[T](
+        expected: T,
+    ) -> Callable[[T | Exception], None]:
+        def _(value: T | Exception) -> None:
+            assert not isinstance(value, Exception)
+            assert value == expected
+
+        return _
+
+    aio = AIODst(random.Random(12), 0)
+    function_subsystem = FunctionSubsystem(aio)
+    echo_subsystem = EchoSubsystem(aio)
+    aio.attach_subsystem(function_subsystem)
+    aio.attach_subsystem(echo_subsystem)
+
+    i = 0
+    for a, b in [
+        (EchoSubmission("data"), _(EchoCompletion("data"))),
+        (EchoSubmission("more"), _(EchoCompletion("more"))),
+        (lambda: "foo", _("foo")),
+        (lambda: "bar", _("bar")),
+    ]:
+        aio.dispatch(SQE(a, b))
+        i += 1
+
+    # one flush processes all of them, nothing is left for a later one
+    aio.flush(0)
+    cqes = aio.dequeue(i)
+    assert len(cqes) == i
+    for cqe in cqes:
+        cqe.cb(cqe.v)
+
+    # workers take what is queued before they start as one batch
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    batches: list[int] = []
+
+    class Batches(EchoSubsystem):
+        def process(self, sqes: list[SQE[EchoSubmission, EchoCompletion]]) -> list[CQE]:
+            batches.append(len(sqes))
+            return super().process(sqes)
+
+    aio.attach_subsystem(Batches(aio, pool, batch_size=10))
+    for data in ("data", "more"):
+        aio.dispatch(SQE(EchoSubmission(data), _(EchoCompletion(data))))
+    aio.start()
+
+    cqes = []
+    deadline = time.monotonic() + 5
+    while len(cqes) < 2 and time.monotonic() < deadline:  # noqa: PLR2004
+        cqes.extend(aio.dequeue(2))
+    aio.shutdown()
+    assert batches == [2]
+    for cqe in cqes:
+        cqe.cb(cqe.v)
+
+
+def test_completion_queue_put_many() -> None:
+    q = CompletionQueue[int](3)
+
+    # a batch is split at capacity, without blocking the rest is left to the caller
+    assert q.put_many([1, 2, 3, 4, 5], block=False) == 3  # noqa: PLR2004
+    assert q.qsize() == 3  # noqa: PLR2004
+    assert q.put_many([6], block=False) == 0
+    assert q.get_many(10) == [1, 2, 3]
+
+
+def test_completion_queue_put_many_blocking() -> None:
+    q = CompletionQueue[int](3)
+    q.put_many([1, 2])
+
+    # the producer puts what fits and waits for the consumer to make room for the rest
+    producer = threading.Thread(target=q.put_many, args=([3, 4, 5, 6],))
+    producer.start()
+    producer.join(0.05)
+    assert producer.is_alive()
+    assert q.qsize() == 3  # noqa: PLR2004
+
+    got = q.get_many(1)
+    producer.join(0.05)
+    assert producer.is_alive()
+    deadline = time.monotonic() + 5
+    while (producer.is_alive() or q.qsize()) and time.monotonic() < deadline:
+        got += q.get_many(10)
+    assert got == [1, 2, 3, 4, 5, 6]
+
+
+def test_completion_queue_get_many() -> None:
+    q = CompletionQueue[int](10)
+    q.put_many([1, 2, 3, 4, 5])
+
+    # items are taken in order, the rest stays queued
+    assert q.get_many(2) == [1, 2]
+    assert q.qsize() == 3  # noqa: PLR2004
+    assert q.get_many(3) == [3, 4, 5]
+    assert q.get_many(3) == []
+
+
+def test_completion_queue_shutdown() -> None:
+    q = CompletionQueue[int](1)
+    q.put(1)
+
+    # a blocked producer is released with ShutDown, the consumer drains what is left
+    # and then gets ShutDown too
+    errors: list[Exception] = []
+
+    def produce() -> None:
+        try:
+            q.put(2)
+        except queue.ShutDown as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    producer.join(0.05)
+    q.shutdown()
+    producer.join(5)
+    assert len(errors) == 1
+
+    with pytest.raises(queue.ShutDown):
+        q.put(3)
+    assert q.get_many(10) == [1]
+    with pytest.raises(queue.ShutDown):
+        q.get_many(10)
+    q.join()
+
+
+def test_function_subsystem_failure() -> None:
+    def fail() -> str:
+        msg = "boom"
+        raise ValueError(msg)
+
+    def _(value: str | Exception) -> None: ...
+
+    aio = AIODst(random.Random(12), 0)
+    function_subsystem = FunctionSubsystem(aio)
+
+    cqes = function_subsystem.process([SQE(fail, _), SQE(lambda: "foo", _)])
+    assert isinstance(cqes[0].v, ValueError)
+    assert cqes[1].v == "foo"
+
+
+def test_process_function_subsystem() -> None:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(
+        ProcessFunctionSubsystem(
+            aio, pool, processes=2, mp_context=multiprocessing.get_context("spawn")
+        )
+    )
+    aio.start()
+
+    fns = [functools.partial(pow, 2, 10), lambda: 1, functools.partial(int, "x")]
+    results: dict[int, object] = {}
+    for i, fn in enumerate(fns):
+        aio.dispatch(SQE(ProcessFunctionSubmission(fn), functools.partial(results.__setitem__, i)))
+
+    while len(results) < len(fns):
+        for cqe in aio.dequeue(len(fns)):
+            cqe.cb(cqe.v)
+
+    assert results[0] == pow(2, 10)
+    assert isinstance(results[1], TypeError)
+    assert "can't be pickled" in str(results[1])
+    assert isinstance(results[2], ValueError)
+
+    aio.shutdown()
+
+
+def test_asyncio_subsystem() -> None:
+    async def sleep(n: int) -> int:
+        await asyncio.sleep(0.01)
+        return n
+
+    async def fail() -> int:
+        msg = "boom"
+        raise ValueError(msg)
+
+    def _(expected: int) -> Callable[[int | Exception], None]:
+        def _(value: int | Exception) -> None:
+            assert value == expected
+
+        return _
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, 1_000)
+    aio.attach_subsystem(AsyncioSubsystem(aio, pool, 1_000))
+
+    # a thousand concurrent sleeps on a single thread, half of them submitted before the
+    # loop exists
+    for i in range(1_000):
+        if i == 500:  # noqa: PLR2004
+            aio.start()
+        aio.dispatch(SQE(sleep(i), _(i)))
+
+    cqes: list[CQE] = []
+    while len(cqes) < 1_000:  # noqa: PLR2004
+        cqes.extend(aio.dequeue(1_000))
+
+    for cqe in cqes:
+        cqe.cb(cqe.v)
+
+    aio.shutdown()
+
+    dst = AIODst(random.Random(12), 0)
+    dst.attach_subsystem(AsyncioSubsystem(dst))
+    results: dict[int, object] = {}
+    dst.dispatch(SQE(sleep(1), functools.partial(results.__setitem__, 0)))
+    dst.dispatch(SQE(fail(), functools.partial(results.__setitem__, 1)))
+    dst.flush(0)
+    for cqe in dst.dequeue(2):
+        cqe.cb(cqe.v)
+
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+
+
+def test_aio_cancel() -> None:
+    async def forever() -> None:
+        await asyncio.Event().wait()
+
+    def _(_value: object) -> None:
+        raise AssertionError
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    echo_subsystem = EchoSubsystem(aio, pool)
+    aio.attach_subsystem(echo_subsystem)
+    aio.attach_subsystem(AsyncioSubsystem(aio, pool))
+
+    # queued submissions are dropped before a worker picks them up
+    sqe = SQE(EchoSubmission("data"), _)
+    aio.dispatch(sqe)
+    assert not echo_subsystem._sq.empty()  # noqa: SLF001
+    aio.cancel(sqe)
+    assert echo_subsystem._sq.empty()  # noqa: SLF001
+
+    # in flight coroutines are cancelled and never complete
+    aio.start()
+    sqe = SQE(forever(), _)
+    aio.dispatch(sqe)
+    aio.cancel(sqe)
+    aio.shutdown()
+    assert aio.dequeue(1) == []
+
+
+def test_aio_cache() -> None:
+    results: list[object] = []
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    aio.attach_cache("echo", maxsize=1, ttl=100)
+    aio.start()
+
+    def run(*data: str) -> None:
+        results.clear()
+        for d in data:
+            aio.dispatch(SQE(EchoSubmission(d), results.append))
+        while len(results) < len(data):
+            for cqe in aio.dequeue(len(data)):
+                cqe.cb(cqe.v)
+        assert results == [EchoCompletion(d) for d in data]
+
+    def counter(name: str) -> float:
+        return aio.metrics.snapshot()[f'{name}{{kind="echo"}}']
+
+    # identical submissions in flight share one dispatch
+    run("a", "a", "a")
+    assert counter("pio_aio_submitted_total") == 1
+    assert counter("pio_aio_coalesced_total") == 2  # noqa: PLR2004
+
+    # completions are cached, the least recently used one is evicted
+    run("a")
+    run("b")
+    run("a")
+    assert counter("pio_aio_submitted_total") == 3  # noqa: PLR2004
+    assert counter("pio_aio_cache_hits_total") == 1
+
+    # and expire after their ttl
+    aio.flush(100)
+    run("a")
+    assert counter("pio_aio_submitted_total") == 4  # noqa: PLR2004
+
+    aio.shutdown()
+
+
+def test_aio_overflow() -> None:
+    results: list[object] = []
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, overflow=2)
+    aio.attach_subsystem(EchoSubsystem(aio, pool, size=1))
+
+    # submissions beyond the subsystem's room are parked, up to the overflow
+    for data in ("a", "b", "c", "d"):
+        aio.dispatch(SQE(EchoSubmission(data), results.append))
+    assert len(results) == 1
+    assert isinstance(results.pop(), Exception)
+    assert aio.metrics.snapshot()['pio_aio_parked{kind="echo"}'] == 2  # noqa: PLR2004
+
+    # and handed over in order as it makes room
+    aio.start()
+    while len(results) < 3:  # noqa: PLR2004
+        for cqe in aio.dequeue(3):
+            cqe.cb(cqe.v)
+        aio.flush(0)
+    assert results == [EchoCompletion(d) for d in ("a", "b", "c")]
+
+    aio.shutdown()
+
+
+def test_aio_overflow_default() -> None:
+    results: list[object] = []
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    echo = EchoSubsystem(aio, pool, size=2)
+    aio.attach_subsystem(echo)
+    aio.attach_cache("echo")
+
+    # parking is bounded by the subsystem's size unless asked otherwise
+    for data in ("a", "b", "c", "d", "e"):
+        aio.dispatch(SQE(EchoSubmission(data), functools.partial(results.append)))
+    assert len(results) == 1
+    assert isinstance(results.pop(), Exception)
+    aio.flush(0)
+    aio.flush(0)
+
+    # followers of a flight don't push a dequeue past n, every dispatch has its own
+    # callback as the scheduler's do
+    for _ in range(2):
+        aio.dispatch(SQE(EchoSubmission("a"), functools.partial(results.append)))
+    aio.start()
+    while len(results) < 6:  # noqa: PLR2004
+        cqes = aio.dequeue(1)
+        assert len(cqes) <= 1
+        for cqe in cqes:
+            cqe.cb(cqe.v)
+        aio.flush(0)
+    assert aio.next_deadline() is None
+    assert sorted(r.data for r in results if isinstance(r, EchoCompletion)) == [
+        "a",
+        "a",
+        "a",
+        "b",
+        "c",
+        "d",
+    ]
+
+    aio.shutdown()
+
+
+def test_autoscaling() -> None:
+    results: list[object] = []
+
+    pool = ThreadPoolExecutor(8)
+    aio = AIOSystem(pool)
+    function_subsystem = FunctionSubsystem(aio, pool, workers=1, max_workers=4, idle=50)
+    aio.attach_subsystem(function_subsystem)
+    aio.start()
+
+    # a backlog of blocked submissions adds a worker per flush, up to max_workers
+    gate = threading.Event()
+    for _ in range(40):
+        aio.dispatch(SQE(functools.partial(gate.wait, 5), results.append))
+
+    aio.flush(0)
+    assert function_subsystem.workers == 1
+    for t in range(1, 5):
+        aio.flush(t)
+        assert function_subsystem.workers == min(t + 1, 4)
+
+    gate.set()
+    while len(results) < 40:  # noqa: PLR2004
+        for cqe in aio.dequeue(40):
+            cqe.cb(cqe.v)
+    assert results == [True] * 40
+
+    # without a backlog no worker is added, and idle ones retire
+    workers = function_subsystem.workers
+    aio.flush(5)
+    assert function_subsystem.workers <= workers
+    deadline = time.monotonic() + 5
+    while function_subsystem.workers > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert function_subsystem.workers == 1
+
+    aio.shutdown()
+
+
+def test_sqlite_subsystem(tmp_path: Path) -> None:
+    results: dict[int, object] = {}
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(SqliteSubsystem(aio, pool, database=tmp_path / "pio.db"))
+
+    # queued before the worker starts, so they run as one batch in one transaction
+    for i, query in enumerate(
+        [
+            Query("create table t (x integer primary key, y text)"),
+            Query("insert into t (y) values (?)", ("a",)),
+            Query("insert into t (y) values (?)", ("b",)),
+            Query("insert into t (y) values (?)", ("c",)),
+            Query("insert into missing (y) values (?)", ("d",)),
+            Query("select y from t order by x"),
+            Query("update t set y = :y where x = :x", {"x": 1, "y": "z"}),
+        ]
+    ):
+        aio.dispatch(SQE(query, functools.partial(results.__setitem__, i)))
+    aio.start()
+
+    while len(results) < 7:  # noqa: PLR2004
+        for cqe in aio.dequeue(7):
+            cqe.cb(cqe.v)
+
+    assert isinstance(results[4], Exception)
+    assert results[5] == Rows((("a",), ("b",), ("c",)), -1, 3)
+    assert results[6] == Rows((), 1, 3)
+    assert aio.metrics.snapshot()['pio_aio_submitted_total{kind="sqlite"}'] == 7  # noqa: PLR2004
+
+    aio.shutdown()
+
+
+def test_sqlite_subsystem_many(tmp_path: Path) -> None:
+    def _(_value: object) -> None: ...
+
+    subsystem = SqliteSubsystem(AIODst(random.Random(0), 0), database=tmp_path / "pio.db")
+    queries = [
+        Query("create table t (x integer primary key, y text)"),
+        Query("insert into t (y) values (?)", ("a",)),
+        Query("insert into t (y) values (?)", ("b",)),
+        Query("insert into t (y) values (?)", ("c",), many=True),
+        Query("insert into t (y) values (?)", ("d",), many=True),
+        Query("select count(*) from t"),
+    ]
+    cqes = subsystem.process([SQE(q, _) for q in queries])
+
+    # identical writes in a batch keep their own results unless they opt in to merging
+    assert [cqe.v for cqe in cqes[1:]] == [
+        Rows((), 1, 1),
+        Rows((), 1, 2),
+        Rows((), -1, None),
+        Rows((), -1, None),
+        Rows(((4,),), -1, 4),
+    ]
+    subsystem.shutdown()
+
+
+def test_file_subsystem(tmp_path: Path) -> None:
+    path = tmp_path / "data"
+    missing = tmp_path / "missing"
+
+    def _(_value: object) -> None: ...
+
+    for threshold in [1 << 20, 1]:
+        subsystem = FileSubsystem(AIODst(random.Random(0), 0), mmap_threshold=threshold)
+        cqes = subsystem.process(
+            [
+                SQE(v, _)
+                for v in [
+                    WriteFile(path, b"hello world"),
+                    Append(path, b"!"),
+                    Append(path, b"?"),
+                    ReadRange(path, 0, 5),
+                    ReadRange(path, 5, 6),
+                    ReadRange(path, 12, 10),
+                    ReadFile(path),
+                    ReadFile(missing),
+                ]
+            ]
+        )
+
+        # writes before reads are visible to them, adjacent ranges are merged
+        assert [cqe.v for cqe in cqes[:7]] == [
+            11,
+            11,
+            12,
+            b"hello",
+            b" world",
+            b"?",
+            b"hello world!?",
+        ]
+        assert isinstance(cqes[7].v, FileNotFoundError)
+
+
+def test_file_subsystem_errors(tmp_path: Path) -> None:
+    path = tmp_path / "data"
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(FileSubsystem(aio, pool))
+
+    # malformed submissions fail on their own, the worker and shutdown carry on
+    results: dict[int, object] = {}
+    for i, v in enumerate(
+        [
+            WriteFile(path, "text"),  # pyright: ignore[reportArgumentType]
+            Append(path, b"data"),
+            ReadRange(path, "0", 4),  # pyright: ignore[reportArgumentType]
+            ReadFile(None),  # pyright: ignore[reportArgumentType]
+            ReadFile(path),
+        ]
+    ):
+        aio.dispatch(SQE(v, functools.partial(results.__setitem__, i)))
+    aio.start()
+
+    while len(results) < 5:  # noqa: PLR2004
+        for cqe in aio.dequeue(5):
+            cqe.cb(cqe.v)
+    aio.shutdown()
+
+    assert isinstance(results[0], TypeError)
+    assert results[1] == 0
+    assert isinstance(results[2], TypeError)
+    assert isinstance(results[3], TypeError)
+    assert results[4] == b"data"
+
+
+class _EchoServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class _Echo(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        while data := self.request.recv(65_536):
+            self.request.sendall(data)
+
+
+def test_net_subsystem() -> None:
+    server = _EchoServer(("127.0.0.1", 0), _Echo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, 1_000)
+    subsystem = NetSubsystem(aio, pool, 1_000, keepalive=4)
+    aio.attach_subsystem(subsystem)
+    aio.start()
+
+    def run(vs: Sequence[NetSubmission]) -> dict[int, object]:
+        results: dict[int, object] = {}
+        for i, v in enumerate(vs):
+            aio.dispatch(SQE(v, functools.partial(results.__setitem__, i)))
+        while len(results) < len(vs):
+            for cqe in aio.dequeue(len(vs)):
+                cqe.cb(cqe.v)
+        return results
+
+    # all requests are in flight on the one selector thread at once
+    requests = [Request(str(host), int(port), b"%d\n" % i, delimiter=b"\n") for i in range(200)]
+    results = run(requests)
+    assert results == {i: b"%d\n" % i for i in range(200)}
+
+    # only keepalive connections stay pooled, the next requests reuse them
+    assert len(subsystem._idle[str(host), int(port)]) == 4  # noqa: PLR2004, SLF001
+    pooled = set(subsystem._idle[str(host), int(port)])  # noqa: SLF001
+    assert run(requests[:4]) == {i: b"%d\n" % i for i in range(4)}
+    assert set(subsystem._idle[str(host), int(port)]) == pooled  # noqa: SLF001
+
+    conn = run([Connect(str(host), int(port))])[0]
+    assert isinstance(conn, Connection)
+    assert run([Send(conn, b"hello")]) == {0: 5}
+    assert run([Recv(conn, 5)]) == {0: b"hello"}
+    assert run([Release(conn)]) == {0: None}
+    assert isinstance(run([Send(conn, b"hello")])[0], ValueError)
+
+    # names are looked up off the selector thread, the rest of a response is dropped
+    assert run([Request("localhost", int(port), b"x\n", delimiter=b"\n")]) == {0: b"x\n"}
+    assert run([Request(str(host), int(port), b"hello", size=3)]) == {0: b"hel"}
+
+    aio.shutdown()
+    server.shutdown()
+    server.server_close()
+
+
+class _OnceServer(_EchoServer):
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.closed = threading.Event()
+
+    def shutdown_request(self, request: Any) -> None:
+        super().shutdown_request(request)
+        self.closed.set()
+
+
+class _Once(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        self.request.sendall(self.request.recv(65_536))
+
+
+def test_net_subsystem_process() -> None:
+    server = _OnceServer(("127.0.0.1", 0), _Once)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = str(server.server_address[0]), int(server.server_address[1])
+
+    def _(_value: object) -> None: ...
+
+    subsystem = NetSubsystem(AIODst(random.Random(0), 0))
+    request = Request(host, port, b"a\n", delimiter=b"\n")
+
+    # completions come back in submission order, not in the order they finish
+    cqes = subsystem.process([SQE(request, _), SQE(Send(Connection(0, host, port), b"x"), _)])
+    assert cqes[0].v == b"a\n"
+    assert isinstance(cqes[1].v, ValueError)
+
+    # the server closed the pooled connection, so the request goes out on a new one
+    assert server.closed.wait(5)
+    assert [cqe.v for cqe in subsystem.process([SQE(request, _)])] == [b"a\n"]
+
+    subsystem.shutdown()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="pipes can't be selected on windows")
+def test_process_subsystem(tmp_path: Path) -> None:
+    script = (
+        "import sys; data = sys.stdin.buffer.read(); sys.stdout.buffer.write(data * 4);"
+        "sys.stderr.write('err'); sys.exit(3)"
+    )
+    stdin = bytes(range(256)) * 1_024
+    runs = [Run((sys.executable, "-c", script), stdin) for _ in range(6)]
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(ProcessSubsystem(aio, pool, max_children=2))
+
+    # submissions that fail to launch don't hold up the ones after them
+    results: dict[int, object] = {}
+    for i, run in enumerate([Run(()), Run((str(tmp_path / "missing"),)), *runs]):
+        aio.dispatch(SQE(run, functools.partial(results.__setitem__, i)))
+    aio.start()
+
+    while len(results) < len(runs) + 2:
+        for cqe in aio.dequeue(len(runs) + 2):
+            cqe.cb(cqe.v)
+
+    assert isinstance(results[0], IndexError)
+    assert isinstance(results[1], FileNotFoundError)
+    # output larger than a pipe's buffer streams while the child writes it
+    for i in range(len(runs)):
+        assert results[i + 2] == Completed(3, stdin * 4, b"err")
+
+    aio.shutdown()
+
+    def _(_value: object) -> None: ...
+
+    subsystem = ProcessSubsystem(AIODst(random.Random(0), 0))
+    cqes = subsystem.process(
+        [SQE(Run((sys.executable, "-c", "print('hi')")), _), SQE(Run(("/nonexistent",)), _)]
+    )
+    assert cqes[0].v == Completed(0, b"hi\n", b"")
+    assert isinstance(cqes[1].v, FileNotFoundError)
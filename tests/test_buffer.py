@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import copy
+import functools
+import multiprocessing
+import pickle
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from pio.aio import AIOSystem
+from pio.buffer import SharedBuffer
+from pio.bus import SQE
+from pio.journal import Journal
+from pio.subsystems.process_function import (
+    ProcessFunctionSubmission,
+    ProcessFunctionSubsystem,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pio.scheduler import Computation
+
+
+def noop() -> Computation[Any, None]:
+    yield from ()
+
+
+def test_shared_buffer() -> None:
+    data = bytes(range(256)) * 1_024
+    with SharedBuffer.from_bytes(data) as buf:
+        assert len(buf) == len(data)
+        assert bytes(buf) == data
+        assert memoryview(buf)[:4].tolist() == [0, 1, 2, 3]
+
+        # plain pickles and copies don't own the segment
+        received = pickle.loads(pickle.dumps(buf))  # noqa: S301
+        assert received.name == buf.name
+        assert bytes(received) == data
+        received.release()
+        assert bytes(copy.copy(buf)) == data
+
+        sent = pickle.loads(pickle.dumps(buf.send()))  # noqa: S301
+        assert sent.name == buf.name
+
+    # ownership moved to the receiver, releasing the sender kept the segment alive
+    assert bytes(SharedBuffer.attach(sent.name, len(data))) == data
+    stale = pickle.dumps(sent)
+    sent.release()
+    with pytest.raises(FileNotFoundError):
+        SharedBuffer.attach(sent.name, len(data))
+    with pytest.raises(FileNotFoundError, match="released by its owner"):
+        pickle.loads(stale)  # noqa: S301
+
+
+def test_shared_buffer_journal(tmp_path: Path) -> None:
+    journal = Journal(tmp_path / "pio.journal")
+    journal.register("noop", noop)
+    i = journal.begin("noop", ())
+    with SharedBuffer.from_bytes(b"pio") as buf:
+        journal.record((i, 0), buf)
+        journal.record((i, 1), b"pio")
+    journal.close()
+
+    # buffers are left out, their submissions run again
+    journal = Journal(tmp_path / "pio.journal")
+    journal.register("noop", noop)
+    assert journal.replay((i, 0)) is None
+    assert journal.replay((i, 1)) == (b"pio",)
+    journal.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="segments don't outlive their handles")
+def test_shared_buffer_process_function() -> None:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(
+        ProcessFunctionSubsystem(
+            aio, pool, processes=1, mp_context=multiprocessing.get_context("spawn")
+        )
+    )
+    aio.start()
+
+    data = b"pio" * 1_000_000
+    src = SharedBuffer.from_bytes(data)
+    fns = [functools.partial(SharedBuffer.from_bytes, b"pio"), functools.partial(bytes, src)]
+    results: dict[int, object] = {}
+    for i, fn in enumerate(fns):
+        aio.dispatch(SQE(ProcessFunctionSubmission(fn), functools.partial(results.__setitem__, i)))
+
+    while len(results) < len(fns):
+        for cqe in aio.dequeue(len(fns)):
+            cqe.cb(cqe.v)
+
+    assert isinstance(results[0], SharedBuffer)
+    assert bytes(results[0]) == b"pio"
+    assert results[1] == data
+    results[0].release()
+
+    aio.shutdown()
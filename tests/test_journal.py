@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import functools
+import random
+from typing import TYPE_CHECKING, Any
+
+from pio.aio import AIODst
+from pio.journal import Journal
+from pio.scheduler import Scheduler
+from pio.subsystems.function import FunctionSubsystem
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pio.scheduler import Computation
+
+calls: list[int] = []
+
+
+def effect(x: int) -> int:
+    calls.append(x)
+    return x * 2
+
+
+def double(x: int) -> Computation[Any, int]:
+    p = yield functools.partial(effect, x)
+    v = yield p
+    return v
+
+
+def twice(x: int) -> Computation[Any, int]:
+    v = yield from double(x)
+    p = yield double(v)
+    v = yield p
+    return v
+
+
+def run(journal: Journal) -> tuple[AIODst, Scheduler]:
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(FunctionSubsystem(aio))
+    journal.register("twice", twice)
+    return aio, Scheduler(aio, journal=journal)
+
+
+def test_journal(tmp_path: Path) -> None:
+    path = tmp_path / "pio.journal"
+    calls.clear()
+
+    # the first run crashes after its first submission completed
+    journal = Journal(path)
+    aio, scheduler = run(journal)
+    scheduler.add_durable("twice", 1)
+    scheduler.run_until_blocked(0)
+    aio.flush(0)
+    for cqe in aio.dequeue(10):
+        cqe.cb(cqe.v)
+    scheduler.run_until_blocked(0)
+    journal.close()
+    assert calls == [1]
+
+    # a torn record at the end is ignored
+    with path.open("ab") as f:
+        f.write(b"\x02\xff")
+
+    # the second run replays it instead of running it again
+    journal = Journal(path)
+    aio, scheduler = run(journal)
+    futures = scheduler.recover()
+    while scheduler.size() > 0:
+        scheduler.run_until_blocked(0)
+        aio.flush(0)
+        for cqe in aio.dequeue(10):
+            cqe.cb(cqe.v)
+    journal.close()
+    assert [f.result() for f in futures] == [4]
+    assert calls == [1, 2]
+
+    # finished computations aren't recovered
+    journal = Journal(path)
+    assert journal.recover() == []
+    journal.close()
+
+
+def _gone() -> None:
+    msg = "gone"
+    raise FileNotFoundError(msg)
+
+
+class Gone:
+    """Pickles fine, but can't be loaded again, like a released shared buffer."""
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (_gone, ())
+
+
+def test_journal_unloadable(tmp_path: Path) -> None:
+    path = tmp_path / "pio.journal"
+    journal = Journal(path)
+    journal.register("twice", twice)
+    done = journal.begin("twice", (1,))
+    journal.record((done, 0), Gone())
+    journal.end(done)
+    pending = journal.begin("twice", (2,))
+    journal.record((pending, 0), Gone())
+    journal.close()
+
+    # results of finished computations aren't loaded, the others run again
+    journal = Journal(path)
+    assert journal.recover() == [(pending, "twice", (2,))]
+    assert journal.replay((pending, 0)) is None
+    journal.close()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from pio import Pio
+from pio.aio import AIOSystem
+from pio.metrics import Histogram, Metrics
+from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+
+if TYPE_CHECKING:
+    from pio.scheduler import Computation
+
+
+def foo(string: str) -> Computation[EchoSubmission, EchoCompletion]:
+    p = yield EchoSubmission(string)
+    v = yield p
+    assert isinstance(v, EchoCompletion)
+    return v
+
+
+def test_histogram() -> None:
+    h = Histogram()
+    for v in range(1, 10_001):
+        h.record(v)
+
+    assert h.count == 10_000  # noqa: PLR2004
+    assert h.max == 10_000  # noqa: PLR2004
+    for q in (50, 90, 99):
+        assert abs(h.percentile(q) - q * 100) <= q * 100 * 0.07
+    assert h.percentile(100) == 10_000  # noqa: PLR2004
+    assert h.buckets()[-1] == (10_239, 10_000)
+
+
+def test_metrics_prometheus() -> None:
+    metrics = Metrics()
+    metrics.counter("requests_total", kind="echo").inc(3)
+    metrics.gauge("depth", lambda: 7)
+    metrics.histogram("latency_us").record(5)
+
+    assert metrics.prometheus().splitlines() == [
+        "# TYPE requests_total counter",
+        'requests_total{kind="echo"} 3',
+        "# TYPE depth gauge",
+        "depth 7",
+        "# TYPE latency_us histogram",
+        'latency_us_bucket{le="5"} 1',
+        'latency_us_bucket{le="+Inf"} 1',
+        "latency_us_sum 5",
+        "latency_us_count 1",
+    ]
+
+
+def test_metrics_export() -> None:
+    exported: list[dict[str, float]] = []
+    metrics = Metrics(export_interval=100)
+    metrics.attach_exporter(exported.append)
+    counter = metrics.counter("ticks_total")
+
+    for time in range(0, 350, 10):
+        counter.inc()
+        metrics.tick(time)
+
+    assert [snapshot["ticks_total"] for snapshot in exported] == [11, 21, 31]
+
+
+def test_metrics_system() -> None:
+    metrics = Metrics()
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    system = Pio(aio, wakeup=True, metrics=metrics)
+
+    system.start()
+    for f in [system.add(foo(str(i))) for i in range(10)]:
+        f.result(timeout=1)
+    system.shutdown()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['pio_aio_submitted_total{kind="echo"}'] == 10  # noqa: PLR2004
+    assert snapshot['pio_aio_completed_total{kind="echo"}'] == 10  # noqa: PLR2004
+    assert snapshot['pio_aio_latency_us_count{kind="echo"}'] == 10  # noqa: PLR2004
+    assert snapshot['pio_scheduler_completed_total{outcome="ok"}'] == 10  # noqa: PLR2004
+    assert snapshot['pio_subsystem_depth{kind="echo"}'] == 0
+    assert snapshot["pio_scheduler_inflight"] == 0
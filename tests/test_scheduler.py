@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-from concurrent.futures import Future, ThreadPoolExecutor
+import queue
+import random
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 from typing import TYPE_CHECKING, Any
 
-from pio.aio import AIOSystem
-from pio.scheduler import Computation, Scheduler
+import pytest
+
+from pio.aio import AIODst, AIOSystem
+from pio.bus import SQE
+from pio.scheduler import All, AnyOf, Computation, Race, Scheduler, Timeout
 from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
 from pio.subsystems.function import FunctionSubsystem
+from pio.subsystems.timer import Deadline, Sleep, TimerSubsystem
 
 if TYPE_CHECKING:
     from collections.abc import Callable
@@ -29,6 +35,15 @@ def bar() -> Computation[Callable[[], str], str]:
     return v
 
 
+def baz(depth: int) -> Computation[EchoSubmission, EchoCompletion]:
+    if depth == 0:
+        v = yield from foo("baz")
+        return v
+    p = yield baz(depth - 1)
+    v = yield p
+    return v
+
+
 def test_scheduler() -> None:
     pool = ThreadPoolExecutor()
     aio = AIOSystem(pool)
@@ -62,3 +77,463 @@ def test_scheduler() -> None:
         assert f.result() == expected
 
     aio.shutdown()
+
+
+def test_scheduler_awaiting() -> None:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool, 1_000)
+    aio.attach_subsystem(EchoSubsystem(aio, pool, 1_000))
+    aio.start()
+    scheduler = Scheduler(aio, 1_000)
+
+    futures = [scheduler.add(baz(i % 5)) for i in range(1_000)]
+    scheduler.run_until_blocked(0)
+    assert scheduler.size() == sum(i % 5 + 1 for i in range(1_000))
+    assert not any(f.done() for f in futures)
+
+    cqes: list[CQE[EchoCompletion]] = []
+    while len(cqes) < len(futures):
+        cqes.extend(aio.dequeue(len(futures)))
+
+    for cqe in cqes:
+        cqe.cb(cqe.v)
+
+    scheduler.run_until_blocked(1)
+    assert scheduler.size() == 0
+    for f in futures:
+        assert f.result() == EchoCompletion("baz")
+
+    aio.shutdown()
+
+
+def test_scheduler_timer() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def deadline(time: int) -> Computation[Deadline, int]:
+        p = yield Deadline(time)
+        v = yield p
+        return v
+
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    scheduler = Scheduler(aio)
+
+    futures = [scheduler.add(sleep(100)), scheduler.add(deadline(50)), scheduler.add(sleep(0))]
+    for time in [10, 20, 60, 109, 110]:
+        for cqe in aio.dequeue(len(futures)):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(time)
+        aio.flush(time)
+
+        if time == 10:  # noqa: PLR2004
+            assert aio.next_deadline() == 50  # noqa: PLR2004
+
+    for cqe in aio.dequeue(len(futures)):
+        cqe.cb(cqe.v)
+    scheduler.run_until_blocked(110)
+    assert scheduler.size() == 0
+    assert [f.result() for f in futures] == [110, 60, 10]
+
+
+def test_scheduler_timer_full() -> None:
+    # timers fire on the loop thread, a full completion queue mustn't block it
+    results: list[object] = []
+    aio = AIOSystem(ThreadPoolExecutor(), 2)
+    aio.attach_subsystem(TimerSubsystem(aio, size=2))
+    echo = EchoSubsystem(aio, size=2)
+    aio.attach_subsystem(echo)
+
+    sqes = [SQE(EchoSubmission(str(i)), results.append) for i in range(2)]
+    aio.enqueue_many([(cqe, "echo") for cqe in echo.process(sqes)])
+    aio.dispatch(SQE(Sleep(0), results.append))
+    aio.dispatch(SQE(Deadline(0), results.append))
+
+    aio.flush(0)
+    assert aio.next_deadline() == 0
+    for cqe in aio.dequeue(2):
+        cqe.cb(cqe.v)
+    aio.flush(1)
+    assert aio.next_deadline() is None
+    for cqe in aio.dequeue(2):
+        cqe.cb(cqe.v)
+
+    assert results == [EchoCompletion("0"), EchoCompletion("1"), 0, 0]
+
+
+def test_scheduler_timeout() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def impatient() -> Computation[Any, str]:
+        p = yield sleep(1_000)
+        try:
+            yield Timeout(p, 100)
+        except TimeoutError:
+            return "timeout"
+        return "slept"
+
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    scheduler = Scheduler(aio)
+
+    futures = [scheduler.add(impatient()), scheduler.add(sleep(1_000), timeout=50)]
+    for time in [0, 50, 100]:
+        scheduler.run_until_blocked(time)
+        aio.flush(time)
+
+    assert futures[0].result() == "timeout"
+    assert isinstance(futures[1].exception(), TimeoutError)
+    assert scheduler.size() == 0
+    assert aio.next_deadline() is None
+
+
+def test_scheduler_timeout_overlap() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def stubborn() -> Computation[Any, str]:
+        p = yield sleep(1_000)
+        try:
+            yield Timeout(p, 40)
+        except TimeoutError:
+            p = yield sleep(1_000)
+            yield p
+        return "slept"
+
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    scheduler = Scheduler(aio)
+
+    # both timeouts expire in the same pass, the second one on the next
+    f = scheduler.add(stubborn(), timeout=50)
+    scheduler.run_until_blocked(0)
+    scheduler.run_until_blocked(60)
+    assert not f.done()
+    assert scheduler.next_deadline() == 50  # noqa: PLR2004
+    scheduler.run_until_blocked(60)
+    aio.flush(60)
+
+    assert isinstance(f.exception(), TimeoutError)
+    assert scheduler.size() == 0
+    assert aio.next_deadline() is None
+
+
+def test_scheduler_cancel() -> None:
+    seen: list[Exception] = []
+
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def parent() -> Computation[Any, str]:
+        yield EchoSubmission("unawaited")
+        p = yield sleep(1_000)
+        try:
+            yield p
+        except CancelledError as e:
+            seen.append(e)
+            raise
+        return "slept"
+
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    aio.attach_subsystem(EchoSubsystem(aio))
+    scheduler = Scheduler(aio)
+
+    f = scheduler.add(parent())
+    scheduler.run_until_blocked(0)
+    assert scheduler.size() > 0
+
+    assert f.cancel()
+    scheduler.run_until_blocked(1)
+    aio.flush(1)
+
+    assert f.cancelled()
+    assert len(seen) == 1
+    assert scheduler.size() == 0
+    assert aio.next_deadline() is None
+    assert aio.dequeue(1) == []
+
+    # cancelled before it was picked up, the computation never runs
+    f = scheduler.add(parent())
+    assert f.cancel()
+    scheduler.run_until_blocked(2)
+    assert len(seen) == 1
+    assert scheduler.size() == 0
+
+
+def test_scheduler_combinators() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def fail() -> Computation[EchoSubmission, EchoCompletion]:
+        yield from foo("fail")
+        msg = "boom"
+        raise ValueError(msg)
+
+    def gather(n: int) -> Computation[Any, list[Any]]:
+        p = yield sleep(10)
+        v = yield All([p, *(EchoSubmission(str(i)) for i in range(n)), foo("foo")])
+        return v
+
+    def first() -> Computation[Any, Any]:
+        v = yield AnyOf([fail(), sleep(20), sleep(10)])
+        return v
+
+    def race() -> Computation[Any, Any]:
+        try:
+            yield Race([fail(), sleep(10)])
+        except ValueError as e:
+            return str(e)
+        return None
+
+    def all_failed() -> Computation[Any, Any]:
+        try:
+            yield AnyOf([fail(), fail()])
+        except ExceptionGroup as e:
+            return len(e.exceptions)
+        return None
+
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    aio.attach_subsystem(EchoSubsystem(aio, size=1_000))
+    scheduler = Scheduler(aio)
+
+    futures = [scheduler.add(gather(100)), scheduler.add(first())]
+    futures += [scheduler.add(race()), scheduler.add(all_failed())]
+    for time in range(0, 30, 5):
+        for cqe in aio.dequeue(1_000):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(time)
+        aio.flush(time)
+
+    assert futures[0].result() == [
+        10,
+        *(EchoCompletion(str(i)) for i in range(100)),
+        EchoCompletion("foo"),
+    ]
+    assert futures[1].result() == 10  # noqa: PLR2004
+    assert futures[2].result() == "boom"
+    assert futures[3].result() == 2  # noqa: PLR2004
+
+    # losers of the race and first are torn down, nothing is left behind
+    assert scheduler.size() == 0
+    assert aio.next_deadline() is None
+
+
+def test_scheduler_combinators_sync() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def gather() -> Computation[Any, list[Any]]:
+        v = yield All([EchoSubmission("a"), sleep(10)])
+        return v
+
+    def first() -> Computation[Any, Any]:
+        v = yield AnyOf([EchoSubmission("b"), sleep(10)])
+        return v
+
+    aio = AIOSystem(ThreadPoolExecutor(), overflow=0)
+    echo = EchoSubsystem(aio, size=1)
+    aio.attach_subsystem(echo)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    aio.attach_cache("echo", maxsize=10)
+
+    # "a" is cached and the echo queue is left full, so "a" completes from the cache and
+    # "b" is rejected, both while the combinator is set up
+    sqe = SQE(EchoSubmission("a"), lambda _: None)
+    aio.dispatch(sqe)
+    aio.enqueue_many([(cqe, "echo") for cqe in echo.process([sqe])])
+    assert len(aio.dequeue(1)) == 1
+
+    scheduler = Scheduler(aio)
+    futures = [scheduler.add(gather()), scheduler.add(first())]
+    for time in [0, 10]:
+        scheduler.run_until_blocked(time)
+        aio.flush(time)
+        if time == 0:
+            assert not any(f.done() for f in futures)
+        for cqe in aio.dequeue(10):
+            cqe.cb(cqe.v)
+    scheduler.run_until_blocked(10)
+
+    assert futures[0].result() == [EchoCompletion("a"), 10]
+    assert futures[1].result() == 10  # noqa: PLR2004
+    assert scheduler.size() == 0
+
+
+def test_scheduler_combinators_nested() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    def fail() -> Computation[EchoSubmission, EchoCompletion]:
+        yield from foo("fail")
+        msg = "boom"
+        raise ValueError(msg)
+
+    def nested() -> Computation[Any, list[Any]]:
+        p = yield sleep(5)
+        v = yield All(
+            [
+                All([EchoSubmission("a"), p]),
+                AnyOf([fail(), sleep(10)]),
+                Race([sleep(20), All([])]),
+            ]
+        )
+        return v
+
+    def timed() -> Computation[Any, Any]:
+        p = yield sleep(5)
+        try:
+            yield All([Timeout(p, 10)])
+        except AssertionError as e:
+            return str(e)
+        return None
+
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(TimerSubsystem(aio))
+    aio.attach_subsystem(EchoSubsystem(aio))
+    scheduler = Scheduler(aio)
+
+    futures = [scheduler.add(nested()), scheduler.add(timed())]
+    for time in range(0, 30, 5):
+        for cqe in aio.dequeue(10):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(time)
+        aio.flush(time)
+
+    assert futures[0].result() == [[EchoCompletion("a"), 5], 10, []]
+    assert futures[1].result() == "items must not be timeouts"
+    assert scheduler.size() == 0
+    assert aio.next_deadline() is None
+
+
+def test_scheduler_steal() -> None:
+    def sleep(ms: int) -> Computation[Sleep, int]:
+        p = yield Sleep(ms)
+        v = yield p
+        return v
+
+    aios = [AIODst(random.Random(12), 0) for _ in range(2)]
+    for aio in aios:
+        aio.attach_subsystem(TimerSubsystem(aio))
+    busy, idle = (Scheduler(aio) for aio in aios)
+    idle.attach_peer(busy)
+
+    futures = [busy.add(sleep(10)) for _ in range(10)]
+    idle.run_until_blocked(0)
+    assert (busy.size(), idle.size()) == (5, 5)
+
+    busy.run_until_blocked(0)
+    for time in [0, 10]:
+        for aio, scheduler in zip(aios, (busy, idle), strict=True):
+            aio.flush(time)
+            for cqe in aio.dequeue(len(futures)):
+                cqe.cb(cqe.v)
+            scheduler.run_until_blocked(time)
+
+    assert [f.result() for f in futures] == [10] * 10
+
+
+def test_scheduler_inline() -> None:
+    def nested(depth: int) -> Computation[Any, int]:
+        if depth == 0:
+            return 0
+        p = yield nested(depth - 1)
+        v = yield p
+        return v + 1
+
+    steps: list[float] = []
+    for inline in [0, 128]:
+        aio = AIODst(random.Random(12), 0)
+        aio.attach_subsystem(EchoSubsystem(aio))
+        scheduler = Scheduler(aio, inline=inline)
+
+        futures = [scheduler.add(nested(100)), scheduler.add(baz(3))]
+        while scheduler.size() > 0:
+            for cqe in aio.dequeue(10):
+                cqe.cb(cqe.v)
+            scheduler.run_until_blocked(0)
+            aio.flush(0)
+
+        assert futures[0].result() == 100  # noqa: PLR2004
+        assert futures[1].result() == EchoCompletion("baz")
+        steps.append(scheduler.metrics.snapshot()["pio_scheduler_tick_steps_sum"])
+
+    # inlined children resume their parents without going through the running queue
+    assert steps[1] < steps[0] / 2
+
+
+def test_scheduler_priority() -> None:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    echo = EchoSubsystem(aio, pool)
+    aio.attach_subsystem(echo)
+    scheduler = Scheduler(aio)
+
+    futures = [
+        scheduler.add(foo("batch"), priority=-1),
+        scheduler.add(foo("default")),
+        scheduler.add(foo("interactive"), priority=1),
+        scheduler.add(foo("later")),
+    ]
+    scheduler.run_until_blocked(0)
+
+    # submissions reach the workers by priority, in arrival order within one
+    assert [echo._sq.get_nowait().v.data for _ in futures] == [  # noqa: SLF001
+        "interactive",
+        "default",
+        "later",
+        "batch",
+    ]
+    for f in futures:
+        f.cancel()
+    scheduler.run_until_blocked(0)
+
+
+def test_scheduler_admission() -> None:
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(EchoSubsystem(aio))
+    scheduler = Scheduler(aio, size=2)
+
+    futures = scheduler.add_many([foo("a"), foo("b")])
+    with pytest.raises(queue.Full):
+        scheduler.add(foo("c"))
+    with pytest.raises(queue.Full):
+        scheduler.add(foo("c"), block=True, block_timeout=0.01)
+
+    # a partially queued batch is cancelled
+    scheduler.run_until_blocked(0)
+    batch = [foo("c"), foo("d"), foo("e")]
+    with pytest.raises(queue.Full):
+        scheduler.add_many(batch)
+    assert scheduler.size() == 4  # noqa: PLR2004
+
+    # blocked adds go through once the loop makes room
+    pool = ThreadPoolExecutor(1)
+    blocked = pool.submit(scheduler.add, foo("f"), block=True)
+    scheduler.run_until_blocked(0)
+    futures.append(blocked.result())
+    for _ in range(10):
+        aio.flush(0)
+        for cqe in aio.dequeue(10):
+            cqe.cb(cqe.v)
+        scheduler.run_until_blocked(0)
+
+    assert [f.result().data for f in futures] == ["a", "b", "f"]
+    assert scheduler.size() == 0
+    pool.shutdown()
@@ -1,20 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import multiprocessing
+import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 from pio import Pio
 from pio.aio import AIOSystem
+from pio.sharded import ProcessShardedPio, ShardedPio
+from pio.subsystems.asyncio import AsyncioSubsystem
 from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
 from pio.subsystems.function import FunctionSubsystem
+from pio.subsystems.timer import Sleep, TimerSubsystem
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Coroutine
 
     from pio.scheduler import Computation
 
 
-
 def foo(string: str) -> Computation[EchoSubmission, EchoCompletion]:
     p = yield EchoSubmission(string)
     v = yield p
@@ -30,6 +36,12 @@ def bar() -> Computation[Callable[[], str], str]:
     return v
 
 
+def sleep(ms: int) -> Computation[Sleep, int]:
+    p = yield Sleep(ms)
+    v = yield p
+    return v
+
+
 def test_system() -> None:
     pool = ThreadPoolExecutor()
     aio = AIOSystem(pool)
@@ -50,3 +62,143 @@ def test_system() -> None:
     for f in futures:
         f.result()
     system.shutdown()
+
+
+def test_system_wakeup() -> None:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    aio.attach_subsystem(FunctionSubsystem(aio, pool))
+    aio.attach_subsystem(TimerSubsystem(aio, pool))
+    system = Pio(aio, wakeup=True)
+
+    system.start()
+    assert system.add(foo("foo")).result(timeout=1) == EchoCompletion("foo")
+    assert system.add(bar()).result(timeout=1) == "foo"
+    assert system.add(sleep(10)).result(timeout=1) > 0
+
+    futures = [system.add(foo(str(i))) for i in range(10)]
+    for i, f in enumerate(futures):
+        assert f.result(timeout=1) == EchoCompletion(str(i))
+    system.shutdown()
+
+
+def test_system_async() -> None:
+    async def fetch(string: str) -> str:
+        await asyncio.sleep(0)
+        return string
+
+    def baz(string: str) -> Computation[Coroutine[Any, Any, str], str]:
+        p = yield fetch(string)
+        v = yield p
+        assert v == string
+        return v
+
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    aio.attach_subsystem(AsyncioSubsystem(aio, pool))
+    system = Pio(aio, wakeup=True)
+    system.start()
+
+    async def main() -> None:
+        assert await system.add_async(foo("foo")) == EchoCompletion("foo")
+        assert await asyncio.gather(*(system.add_async(baz(str(i))) for i in range(10))) == [
+            str(i) for i in range(10)
+        ]
+
+    asyncio.run(main())
+    system.shutdown()
+
+
+def echo_aio() -> AIOSystem:
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    aio.attach_subsystem(FunctionSubsystem(aio, pool))
+    return aio
+
+
+def test_sharded() -> None:
+    system = ShardedPio(echo_aio, shards=4, wakeup=True)
+    system.start()
+
+    futures = [system.add(foo(str(i))) for i in range(100)]
+    futures += [system.add(bar(), key=i) for i in range(10)]
+    for i, f in enumerate(futures[:100]):
+        assert f.result(timeout=1) == EchoCompletion(str(i))
+    for f in futures[100:]:
+        assert f.result(timeout=1) == "foo"
+    system.shutdown()
+
+
+def stolen(shard: Pio) -> float:
+    return shard.metrics.snapshot()["pio_scheduler_stolen_total"]
+
+
+def test_sharded_steal() -> None:
+    system = ShardedPio(echo_aio, shards=2, wakeup=True)
+    busy, idle = system.shards
+
+    # only the first shard gets work, the second one picks some of it up on its own
+    # before the first shard even starts
+    futures = [busy.add(foo(str(i))) for i in range(100)]
+    idle.start()
+    deadline = time.monotonic() + 1
+    while stolen(idle) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    busy.start()
+    for i, f in enumerate(futures):
+        assert f.result(timeout=1) == EchoCompletion(str(i))
+    system.shutdown()
+
+    assert stolen(idle) >= 50  # noqa: PLR2004
+    assert stolen(busy) == 0
+
+
+def test_sharded_no_steal() -> None:
+    system = ShardedPio(echo_aio, shards=2, wakeup=True, steal=False)
+    busy, idle = system.shards
+
+    futures = [busy.add(foo(str(i))) for i in range(100)]
+    idle.start()
+    busy.start()
+    for i, f in enumerate(futures):
+        assert f.result(timeout=1) == EchoCompletion(str(i))
+    system.shutdown()
+
+    assert stolen(idle) == 0
+
+
+def test_sharded_processes() -> None:
+    system = ProcessShardedPio(
+        echo_aio, shards=2, size=2, mp_context=multiprocessing.get_context("spawn")
+    )
+    system.start()
+
+    # a burst much larger than the shards' queues waits for room instead of failing
+    futures = [system.add(functools.partial(foo, str(i))) for i in range(100)]
+    for i, f in enumerate(futures):
+        assert f.result(timeout=10) == EchoCompletion(str(i))
+    system.shutdown()
+
+
+def nap(seconds: float) -> Computation[Callable[[], None], None]:
+    p = yield functools.partial(time.sleep, seconds)
+    v = yield p
+    return v
+
+
+def test_sharded_processes_died() -> None:
+    system = ProcessShardedPio(echo_aio, shards=2, mp_context=multiprocessing.get_context("spawn"))
+    system.start()
+
+    # keys pick the shard, the first one dies with a computation outstanding
+    napping = system.add(functools.partial(nap, 60), key=0)
+    assert system.add(functools.partial(foo, "a"), key=1).result(timeout=10) == EchoCompletion("a")
+    system._processes[0].kill()  # noqa: SLF001
+
+    assert isinstance(napping.exception(timeout=10), RuntimeError)
+    assert isinstance(system.add(functools.partial(foo, "b"), key=0).exception(), RuntimeError)
+    assert system.add(functools.partial(foo, "c"), key=1).result(timeout=10) == EchoCompletion("c")
+    system.shutdown()
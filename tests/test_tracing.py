@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from pio import Pio
+from pio.aio import AIODst, AIOSystem
+from pio.scheduler import Scheduler
+from pio.subsystems.echo import EchoCompletion, EchoSubmission, EchoSubsystem
+from pio.tracing import Tracer
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pio.scheduler import Computation
+
+
+def foo(string: str) -> Computation[EchoSubmission, EchoCompletion]:
+    p = yield EchoSubmission(string)
+    v = yield p
+    assert isinstance(v, EchoCompletion)
+    return v
+
+
+def bar() -> Computation[EchoSubmission, EchoCompletion]:
+    p = yield foo("bar")
+    v = yield p
+    return v
+
+
+def test_tracing(tmp_path: Path) -> None:
+    tracer = Tracer()
+    pool = ThreadPoolExecutor()
+    aio = AIOSystem(pool)
+    aio.attach_subsystem(EchoSubsystem(aio, pool))
+    system = Pio(aio, wakeup=True, tracer=tracer)
+
+    system.start()
+    assert system.add(bar()).result(timeout=1) == EchoCompletion("bar")
+    system.shutdown()
+
+    path = tmp_path / "trace.json"
+    tracer.dump(path)
+    events = json.loads(path.read_text())["traceEvents"]
+
+    computations = [e for e in events if e["cat"] == "computation"]
+    assert Counter(e["ph"] for e in computations) == {"b": 3, "e": 3}
+    begins = {e["name"]: e["args"] for e in computations if e["ph"] == "b"}
+    assert begins["foo"]["parent"] == begins["bar"]["computation"]
+    assert begins["EchoSubmission"]["parent"] == begins["foo"]["computation"]
+
+    steps = [e for e in events if e["cat"] == "step"]
+    assert {e["name"] for e in steps} == {"bar", "foo"}
+    assert all(e["args"]["cpu_us"] >= 0 for e in steps)
+
+    aio_spans = [e["name"] for e in events if e["cat"] == "aio" and e["ph"] == "b"]
+    assert aio_spans == ["echo", "queued", "service", "completion"]
+    aio_args = next(e["args"] for e in events if e["cat"] == "aio")
+    assert aio_args["computation"] == begins["EchoSubmission"]["computation"]
+
+
+def test_tracing_undispatched() -> None:
+    # a dst aio never reports dequeued submissions, their links go with the computation
+    tracer = Tracer()
+    aio = AIODst(random.Random(12), 0)
+    aio.attach_subsystem(EchoSubsystem(aio))
+    scheduler = Scheduler(aio, tracer=tracer)
+
+    f = scheduler.add(bar())
+    while not f.done():
+        scheduler.run_until_blocked(0)
+        aio.flush(0)
+        for cqe in aio.dequeue(10):
+            cqe.cb(cqe.v)
+
+    assert f.result() == EchoCompletion("bar")
+    assert tracer._links == {}  # noqa: SLF001
+    assert tracer._ids == {}  # noqa: SLF001